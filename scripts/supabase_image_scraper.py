@@ -14,21 +14,25 @@ Usage:
 
 What it does:
     - Reads Shopify store domains from JSON config
-    - Fetches /products.json from each store
+    - Fetches /products.json from each store (concurrently, via aiohttp)
     - Extracts image URLs from product data
     - Updates existing Supabase releases table with images
     - Creates new records if SKU/name matches
 """
 import argparse
-import json
+import asyncio
 import logging
 import os
+import shelve
 import sys
-import time
 from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
+import aiohttp
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Supabase configuration from environment
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
@@ -45,63 +49,151 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
 
 USER_AGENT = "LiveShoeTracker/2.0 (+https://github.com/itsjoshwalls/Live-Shoe-Tracker)"
 
+# Shelve file holding per-store ETag/Last-Modified + feeds and per-product updated_at
+CACHE_PATH = ".scraper_cache"
 
-def fetch_products_json(domain: str, timeout: int = 15) -> Optional[Dict]:
-    """Fetch Shopify products.json endpoint."""
+# Supabase auth headers are sent per request rather than set on the session,
+# so the service role key never leaks to the Shopify stores we crawl.
+SUPABASE_HEADERS = {
+    "apikey": SUPABASE_SERVICE_ROLE_KEY,
+    "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+    "Content-Type": "application/json",
+    "Prefer": "resolution=merge-duplicates",
+}
+
+# Transient statuses worth retrying; Retry-After is honored when present
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 1.0
+
+# Keep-alive session for Supabase writes (Shopify fetches go through aiohttp).
+# Upserts use merge-duplicates, so retrying a POST is safe.
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=sorted(RETRY_STATUSES),
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    ),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+
+async def fetch_products_json_async(
+    session: aiohttp.ClientSession,
+    domain: str,
+    timeout: int = 15,
+    cache: Optional[shelve.Shelf] = None
+) -> Optional[Dict]:
+    """Fetch Shopify products.json endpoint.
+
+    When a cache is given, the last ETag / Last-Modified for the domain are
+    sent as conditional headers and a 304 is served from the cached feed.
+    """
     urls_to_try = [
         f"https://{domain}/products.json?limit=250",
         f"https://{domain}/products.json",
     ]
-    headers = {"User-Agent": USER_AGENT}
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    cached = cache.get(f"feed:{domain}") if cache is not None else None
     
     for url in urls_to_try:
-        try:
-            resp = requests.get(url, headers=headers, timeout=timeout)
-            if resp.status_code == 200:
-                return resp.json()
-            logging.debug(f"{url} returned {resp.status_code}")
-        except Exception as e:
-            logging.debug(f"Error fetching {url}: {e}")
+        headers = {}
+        if cached and cached["url"] == url:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        
+        for attempt in range(MAX_RETRIES + 1):
+            status = None
+            retry_after = None
+            try:
+                async with session.get(url, headers=headers, timeout=client_timeout) as resp:
+                    if resp.status == 304 and cached:
+                        logging.debug(f"{url} not modified; using cached feed")
+                        return cached["data"]
+                    if resp.status == 200:
+                        data = orjson.loads(await resp.read())
+                        if cache is not None:
+                            cache[f"feed:{domain}"] = {
+                                "url": url,
+                                "etag": resp.headers.get("ETag"),
+                                "last_modified": resp.headers.get("Last-Modified"),
+                                "data": data,
+                            }
+                        return data
+                    status = resp.status
+                    retry_after = resp.headers.get("Retry-After")
+                    logging.debug(f"{url} returned {status}")
+            except Exception as e:
+                logging.debug(f"Error fetching {url}: {e}")
+            
+            # Non-transient status (e.g. 404): fall back to the next URL
+            if status is not None and status not in RETRY_STATUSES:
+                break
+            if attempt == MAX_RETRIES:
+                logging.warning(f"Giving up on {domain} after {attempt + 1} attempts")
+                return None
+            await asyncio.sleep(_retry_delay(retry_after, attempt))
     
     return None
 
 
-def extract_images(product: Dict) -> List[str]:
-    """Extract and normalize image URLs from Shopify product."""
+def _retry_delay(retry_after: Optional[str], attempt: int) -> float:
+    """Seconds to wait before the next attempt: Retry-After if given, else backoff."""
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), 60.0)
+    return BACKOFF_FACTOR * (2 ** attempt)
+
+
+def extract_images(product: Dict, limit: int = 10) -> List[str]:
+    """Extract and normalize image URLs from Shopify product.
+
+    Variant images reference entries in product.images, so those alone are
+    scanned. Capped at ``limit`` images per product.
+    """
+    seen = set()
     images = []
     
-    # Get images from product.images array
-    for img in product.get("images", []):
+    for img in product.get("images", ()):
         src = img.get("src")
-        if src:
-            # Remove query params for deduplication
-            clean_url = src.split("?")[0]
-            if clean_url not in images:
-                images.append(clean_url)
-    
-    # Also check variants for additional images
-    for variant in product.get("variants", []):
-        if variant.get("image_id"):
-            # Variant references an image ID; already captured above
+        if not src:
+            continue
+        # Remove query params for deduplication
+        clean_url = src.partition("?")[0]
+        if clean_url in seen:
             continue
+        seen.add(clean_url)
+        images.append(clean_url)
+        if len(images) == limit:
+            break
     
-    return images[:10]  # Cap at 10 images per product
+    return images
 
 
-def update_supabase_release(
+def build_payload(
     product: Dict,
     domain: str,
     images: List[str],
-    dry_run: bool = False
-) -> bool:
-    """Update or insert release record in Supabase with images."""
+    updated_at: Optional[str] = None
+) -> Optional[Dict]:
+    """Build the Supabase release row for a Shopify product (no HTTP).
+
+    Pass ``updated_at`` to share one timestamp across a whole batch.
+    """
     title = product.get("title")
-    product_id = product.get("id")
     handle = product.get("handle")
     
     if not title:
         logging.warning(f"Skipping product with no title from {domain}")
-        return False
+        return None
     
     # Try to extract SKU
     sku = None
@@ -115,88 +207,170 @@ def update_supabase_release(
         "images": images,
         "retailer": domain,
         "url": f"https://{domain}/products/{handle}" if handle else f"https://{domain}",
-        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "updated_at": updated_at or datetime.now(timezone.utc).isoformat(timespec="seconds"),
     }
     
     if sku:
         payload["sku"] = sku
     
-    # Prepare Supabase API request
-    headers = {
-        "apikey": SUPABASE_SERVICE_ROLE_KEY,
-        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "resolution=merge-duplicates",
-    }
+    return payload
+
+
+def flush_batch(
+    payloads: List[Dict],
+    batch_size: int = 500,
+    dry_run: bool = False
+) -> Tuple[int, int]:
+    """Upsert release rows into Supabase in chunks of ``batch_size``.
+
+    PostgREST accepts a JSON array for bulk upsert, so each chunk is a single
+    POST. Chunks are capped at ~500 rows to stay clear of statement timeouts.
+
+    Returns:
+        (inserted, failed) row counts
+    """
+    if not payloads:
+        return 0, 0
+    
+    if dry_run:
+        for payload in payloads:
+            logging.info(f"[DRY RUN] Would upsert: {payload['name']} with {len(payload['images'])} images")
+        return len(payloads), 0
     
     endpoint = f"{SUPABASE_URL}/rest/v1/releases"
+    # Use upsert with on_conflict for name
+    params = {"on_conflict": "name"}
     
-    if dry_run:
-        logging.info(f"[DRY RUN] Would upsert: {title} with {len(images)} images")
-        return True
-    
-    try:
-        # Use upsert with on_conflict for name or sku
-        params = {"on_conflict": "name"}
-        response = requests.post(
-            endpoint,
-            headers=headers,
-            json=payload,
-            params=params,
-            timeout=10
-        )
-        
-        if response.status_code in (200, 201):
-            logging.info(f"✓ Updated {title} ({len(images)} images)")
-            return True
-        else:
-            logging.error(f"Failed to update {title}: {response.status_code} - {response.text}")
-            return False
+    # PostgREST requires every object in a bulk insert to share the same keys,
+    # so rows with and without an optional "sku" go out in separate requests.
+    # Rows are also keyed by name: an upsert cannot touch the same row twice.
+    groups: Dict[Tuple[str, ...], Dict[str, Dict]] = {}
+    for payload in payloads:
+        groups.setdefault(tuple(payload), {})[payload["name"]] = payload
+    
+    chunks = []
+    for rows_by_name in groups.values():
+        rows = list(rows_by_name.values())
+        chunks.extend(rows[i:i + batch_size] for i in range(0, len(rows), batch_size))
+    
+    inserted = 0
+    failed = 0
+    for chunk in chunks:
+        try:
+            response = SESSION.post(
+                endpoint,
+                headers=SUPABASE_HEADERS,
+                data=orjson.dumps(chunk),
+                params=params,
+                timeout=30
+            )
             
-    except Exception as e:
-        logging.error(f"Error updating {title}: {e}")
-        return False
+            if response.status_code in (200, 201):
+                logging.info(f"✓ Upserted {len(chunk)} releases")
+                inserted += len(chunk)
+            else:
+                logging.error(f"Failed to upsert batch of {len(chunk)}: {response.status_code} - {response.text}")
+                failed += len(chunk)
+                
+        except Exception as e:
+            logging.error(f"Error upserting batch of {len(chunk)}: {e}")
+            failed += len(chunk)
+    
+    return inserted, failed
 
 
-def run_scraper(config_path: str, dry_run: bool = False, pause: float = 1.0):
-    """Main scraper loop."""
-    with open(config_path, "r", encoding="utf-8") as f:
-        cfg = json.load(f)
+async def run_scraper_async(
+    config_path: str,
+    dry_run: bool = False,
+    concurrency: int = 10,
+    batch_size: int = 500,
+    cache_path: Optional[str] = CACHE_PATH
+):
+    """Main scraper: fetch every store concurrently, then upsert in batches."""
+    with open(config_path, "rb") as f:
+        cfg = orjson.loads(f.read())
     
     stores = cfg.get("stores", [])
     if not stores:
         logging.error("No stores found in config")
         return
     
-    total_updated = 0
+    if cache_path:
+        with shelve.open(cache_path) as cache:
+            await _scrape_stores(stores, dry_run, concurrency, batch_size, cache)
+    else:
+        await _scrape_stores(stores, dry_run, concurrency, batch_size, None)
+
+
+async def _scrape_stores(
+    stores: List[str],
+    dry_run: bool,
+    concurrency: int,
+    batch_size: int,
+    cache: Optional[shelve.Shelf]
+):
+    # The semaphore throttles concurrent stores instead of sleeping between them
+    sem = asyncio.Semaphore(concurrency)
+    
+    async def fetch(session: aiohttp.ClientSession, domain: str) -> Optional[Dict]:
+        async with sem:
+            logging.info(f"Processing {domain}...")
+            return await fetch_products_json_async(session, domain, cache=cache)
+    
+    async with aiohttp.ClientSession(headers={"User-Agent": USER_AGENT}) as session:
+        tasks = [fetch(session, domain) for domain in stores]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    # Every row in this run shares one updated_at
+    now_iso = datetime.now(timezone.utc).isoformat(timespec="seconds")
     total_images = 0
+    total_unchanged = 0
+    payloads: List[Dict] = []
+    # product cache key -> Shopify updated_at, recorded once the upsert lands
+    seen_products: Dict[str, str] = {}
     
-    for domain in stores:
-        logging.info(f"Processing {domain}...")
-        
-        products_data = fetch_products_json(domain)
+    for domain, products_data in zip(stores, results):
+        if isinstance(products_data, Exception):
+            logging.error(f"Error processing {domain}: {products_data}")
+            continue
         if not products_data:
             logging.info(f"  No products.json available for {domain} (consider Playwright for JS-heavy sites)")
-            time.sleep(pause)
             continue
         
         products = products_data.get("products", [])
-        logging.info(f"  Found {len(products)} products")
+        logging.info(f"  {domain}: found {len(products)} products")
         
         for product in products:
+            # Skip products whose updated_at matches the last successful upsert
+            product_key = f"product:{domain}:{product.get('id')}"
+            updated_at = product.get("updated_at")
+            if cache is not None and updated_at and cache.get(product_key) == updated_at:
+                total_unchanged += 1
+                continue
+            
             images = extract_images(product)
             if not images:
                 continue
             
-            success = update_supabase_release(product, domain, images, dry_run=dry_run)
-            if success:
-                total_updated += 1
+            payload = build_payload(product, domain, images, updated_at=now_iso)
+            if payload:
+                payloads.append(payload)
                 total_images += len(images)
-        
-        time.sleep(pause)
+                if updated_at:
+                    seen_products[product_key] = updated_at
+    
+    total_updated, total_failed = flush_batch(payloads, batch_size=batch_size, dry_run=dry_run)
+    
+    # Failed chunks aren't tracked per row, so only remember a fully clean run
+    if cache is not None and not dry_run and not total_failed:
+        cache.update(seen_products)
     
     logging.info(f"\n{'[DRY RUN] ' if dry_run else ''}Summary:")
     logging.info(f"  Updated {total_updated} releases")
+    if total_failed:
+        logging.info(f"  Failed {total_failed} releases")
+    if total_unchanged:
+        logging.info(f"  Skipped {total_unchanged} unchanged products")
     logging.info(f"  Total images collected: {total_images}")
 
 
@@ -208,7 +382,10 @@ def main():
         help="Path to stores JSON config"
     )
     parser.add_argument("--dry-run", action="store_true", help="Preview changes without writing")
-    parser.add_argument("--pause", type=float, default=1.0, help="Pause between stores (seconds)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Max stores fetched at once")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per Supabase upsert request")
+    parser.add_argument("--cache", default=CACHE_PATH, help="Path of the conditional-request cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Refetch and re-upsert everything")
     args = parser.parse_args()
     
     logging.basicConfig(
@@ -217,7 +394,13 @@ def main():
         datefmt="%H:%M:%S"
     )
     
-    run_scraper(args.stores, dry_run=args.dry_run, pause=args.pause)
+    asyncio.run(run_scraper_async(
+        args.stores,
+        dry_run=args.dry_run,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        cache_path=None if args.no_cache else args.cache
+    ))
 
 
 if __name__ == "__main__":
@@ -15,11 +15,13 @@ Model: Baseline linear regression; can expand to XGBoost/LSTM for time-series.
 
 import os
 import sys
-import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 import numpy as np
+import orjson
 import pandas as pd
 
 # Firebase Admin for Firestore data retrieval
@@ -33,8 +35,6 @@ except ImportError:
 # ML libraries
 try:
     from sklearn.model_selection import train_test_split
-    from sklearn.linear_model import LinearRegression
-    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 except ImportError:
     print("ERROR: scikit-learn not installed. Run: pip install scikit-learn")
     sys.exit(1)
@@ -46,8 +46,20 @@ except ImportError:
     stats = None
 
 
+# Optional: Polars runs the per-SKU window features in native code
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+
+@lru_cache(maxsize=1)
 def init_firestore() -> Any:
-    """Initialize Firestore client using service account from environment."""
+    """Initialize Firestore client using service account from environment (memoized)."""
+    # Already initialized: skip re-parsing the service account
+    if firebase_admin._apps:
+        return firestore.client()
+    
     sa_json = os.getenv("FIREBASE_SERVICE_ACCOUNT")
     if not sa_json:
         print("ERROR: FIREBASE_SERVICE_ACCOUNT environment variable not set.")
@@ -55,46 +67,101 @@ def init_firestore() -> Any:
         sys.exit(1)
     
     try:
-        sa = json.loads(sa_json)
-    except json.JSONDecodeError as e:
+        sa = orjson.loads(sa_json)
+    except orjson.JSONDecodeError as e:
         print(f"ERROR: FIREBASE_SERVICE_ACCOUNT is not valid JSON: {e}")
         sys.exit(1)
     
-    # Initialize if not already
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(sa)
-        firebase_admin.initialize_app(cred)
+    cred = credentials.Certificate(sa)
+    firebase_admin.initialize_app(cred)
     
     return firestore.client()
 
 
-def fetch_price_history(db: Any, collection: str = "price_points", limit: int = 5000) -> pd.DataFrame:
+# Only these fields are read from price point documents
+PRICE_POINT_FIELDS = ["sku", "platform", "price", "timestamp", "sneaker_name"]
+
+
+def _fetch_time_windows(query: Any, limit: int, workers: int) -> List[Dict[str, Any]]:
+    """
+    Stream `query` as `workers` equal-width timestamp windows in parallel.
+    Returns up to `limit` documents, newest first.
+    """
+    newest = list(query.order_by("timestamp", direction=firestore.Query.DESCENDING).limit(1).stream())
+    oldest = list(query.order_by("timestamp", direction=firestore.Query.ASCENDING).limit(1).stream())
+    if not newest or not oldest:
+        return []
+    
+    t_max = newest[0].to_dict()["timestamp"]
+    t_min = oldest[0].to_dict()["timestamp"]
+    step = (t_max - t_min) / workers
+    bounds = [t_min + step * i for i in range(workers)] + [t_max]
+    
+    def fetch_window(i: int) -> List[Dict[str, Any]]:
+        window = query.where("timestamp", ">=", bounds[i])
+        # Upper bound is exclusive except for the newest window
+        op = "<=" if i == workers - 1 else "<"
+        window = window.where("timestamp", op, bounds[i + 1])
+        docs = window.order_by("timestamp", direction=firestore.Query.DESCENDING).limit(limit).stream()
+        return [doc.to_dict() for doc in docs]
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        windows = list(executor.map(fetch_window, range(workers)))
+    
+    # Windows are disjoint, so walking them newest-first keeps global order
+    records: List[Dict[str, Any]] = []
+    for window in reversed(windows):
+        records.extend(window[:limit - len(records)])
+        if len(records) >= limit:
+            break
+    return records
+
+
+def fetch_price_history(
+    db: Any,
+    collection: str = "price_points",
+    limit: int = 5000,
+    workers: int = 1
+) -> pd.DataFrame:
     """
     Fetch historical price points from Firestore.
     Expected schema: {sku, platform, price, timestamp, sneaker_name, ...}
+    
+    With workers > 1 the timestamp range is split into that many windows
+    which are streamed concurrently.
     """
     print(f"Fetching up to {limit} price points from '{collection}'...")
-    docs = db.collection(collection).order_by("timestamp", direction=firestore.Query.DESCENDING).limit(limit).stream()
-    
-    records = []
-    for doc in docs:
-        data = doc.to_dict()
-        records.append({
-            "sku": data.get("sku"),
-            "platform": data.get("platform"),
-            "price": data.get("price"),
-            "timestamp": data.get("timestamp"),
-            "sneaker_name": data.get("sneaker_name"),
-        })
-    
-    df = pd.DataFrame(records)
-    if df.empty:
+    # Project to the fields we use so Firestore doesn't ship whole documents
+    query = db.collection(collection).select(PRICE_POINT_FIELDS)
+    if workers > 1:
+        docs = _fetch_time_windows(query, limit, workers)
+    else:
+        docs = (
+            doc.to_dict()
+            for doc in query.order_by("timestamp", direction=firestore.Query.DESCENDING).limit(limit).stream()
+        )
+    
+    # Build columns directly rather than a list of per-row dicts
+    skus, platforms, prices, timestamps, names = [], [], [], [], []
+    for data in docs:
+        skus.append(data.get("sku"))
+        platforms.append(data.get("platform"))
+        prices.append(data.get("price"))
+        timestamps.append(data.get("timestamp"))
+        names.append(data.get("sneaker_name"))
+    
+    if not skus:
         print("WARN: No price points found. Ensure price_points collection is populated.")
-        return df
+        return pd.DataFrame(columns=PRICE_POINT_FIELDS)
     
-    # Convert Firestore timestamp to datetime
-    if "timestamp" in df.columns:
-        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    df = pd.DataFrame({
+        "sku": skus,
+        "platform": platforms,
+        "price": pd.to_numeric(pd.Series(prices), errors="coerce").astype(np.float32),
+        # Convert Firestore timestamp to datetime
+        "timestamp": pd.to_datetime(timestamps, errors="coerce", utc=True),
+        "sneaker_name": names,
+    })
     
     print(f"Loaded {len(df)} price points.")
     return df
@@ -113,36 +180,61 @@ def compute_features(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return df
     
+    if pl is not None:
+        df = _compute_features_polars(df)
+        print("Computed features: price_ma_7d, price_ma_30d, price_volatility_7d, days_since_release, resale_spread")
+        return df
+    
     # Sort by SKU and timestamp
     df = df.sort_values(by=["sku", "timestamp"]).reset_index(drop=True)
     
-    # Group by SKU for rolling calculations
-    df["price_ma_7d"] = df.groupby("sku")["price"].transform(lambda x: x.rolling(7, min_periods=1).mean())
-    df["price_ma_30d"] = df.groupby("sku")["price"].transform(lambda x: x.rolling(30, min_periods=1).mean())
-    df["price_volatility_7d"] = df.groupby("sku")["price"].transform(lambda x: x.rolling(7, min_periods=1).std().fillna(0))
+    # Build the SKU grouping once and reuse it for every feature. Rolling on
+    # the groupby directly avoids dispatching a Python lambda per group.
+    grouped = df.groupby("sku", sort=False)
+    price = grouped["price"]
+    
+    df["price_ma_7d"] = price.rolling(7, min_periods=1).mean().reset_index(level=0, drop=True)
+    df["price_ma_30d"] = price.rolling(30, min_periods=1).mean().reset_index(level=0, drop=True)
+    df["price_volatility_7d"] = price.rolling(7, min_periods=1).std().reset_index(level=0, drop=True).fillna(0)
     
     # Compute days since earliest timestamp per SKU (proxy for release recency)
-    df["min_timestamp"] = df.groupby("sku")["timestamp"].transform("min")
-    df["days_since_release"] = (df["timestamp"] - df["min_timestamp"]).dt.days
+    df["days_since_release"] = (df["timestamp"] - grouped["timestamp"].transform("min")).dt.days
     
     # Placeholder: resale_spread (requires retail price; for now, use price deviation from SKU mean)
-    df["sku_mean_price"] = df.groupby("sku")["price"].transform("mean")
-    df["resale_spread"] = df["price"] - df["sku_mean_price"]
-    
-    # Drop helper columns
-    df = df.drop(columns=["min_timestamp", "sku_mean_price"], errors="ignore")
+    df["resale_spread"] = df["price"] - price.transform("mean")
     
     print("Computed features: price_ma_7d, price_ma_30d, price_volatility_7d, days_since_release, resale_spread")
     return df
 
 
+def _compute_features_polars(df: pd.DataFrame) -> pd.DataFrame:
+    """Polars implementation of compute_features (window functions over SKU)."""
+    pldf = pl.from_pandas(df).sort(["sku", "timestamp"], nulls_last=True)
+    # pandas' groupby drops rows without a SKU, leaving their features NaN;
+    # polars would window them as one extra group, so mask them out
+    has_sku = pl.col("sku").is_not_null()
+    pldf = pldf.with_columns([
+        pl.when(has_sku).then(expr).alias(name)
+        for name, expr in (
+            ("price_ma_7d", pl.col("price").rolling_mean(7, min_samples=1).over("sku")),
+            ("price_ma_30d", pl.col("price").rolling_mean(30, min_samples=1).over("sku")),
+            ("price_volatility_7d", pl.col("price").rolling_std(7, min_samples=1).over("sku")
+                .fill_nan(0).fill_null(0)),
+            ("days_since_release", (pl.col("timestamp") - pl.col("timestamp").min().over("sku"))
+                .dt.total_days()),
+            ("resale_spread", pl.col("price") - pl.col("price").mean().over("sku")),
+        )
+    ])
+    return pldf.to_pandas()
+
+
 def build_baseline_model(df: pd.DataFrame, target_col: str = "price") -> Dict[str, Any]:
     """
     Train a baseline linear regression model to predict future price.
     Features: price_ma_7d, price_ma_30d, price_volatility_7d, days_since_release, resale_spread
     Target: price (next period)
     
-    Returns dict with model, metrics, and feature importance.
+    Returns dict with coefficients, intercept, metrics, and feature importance.
     """
     feature_cols = ["price_ma_7d", "price_ma_30d", "price_volatility_7d", "days_since_release", "resale_spread"]
     
@@ -152,21 +244,26 @@ def build_baseline_model(df: pd.DataFrame, target_col: str = "price") -> Dict[st
     if len(df_clean) < 50:
         print(f"WARN: Only {len(df_clean)} clean samples; model may be unreliable.")
     
-    X = df_clean[feature_cols].values
-    y = df_clean[target_col].values
+    X = np.ascontiguousarray(df_clean[feature_cols].to_numpy(dtype=np.float32))
+    y = df_clean[target_col].to_numpy(dtype=np.float32)
     
     # Train/test split (80/20)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
-    # Train linear regression
-    model = LinearRegression()
-    model.fit(X_train, y_train)
+    # Ordinary least squares, solved directly with an appended bias column
+    A = np.c_[X_train, np.ones(len(X_train), dtype=np.float32)]
+    solution, *_ = np.linalg.lstsq(A, y_train, rcond=None)
+    # Stored as float32 so predict_demand is a single sgemv with no casts
+    coef = np.ascontiguousarray(solution[:-1], dtype=np.float32)
+    intercept = np.float32(solution[-1])
     
     # Evaluate
-    y_pred = model.predict(X_test)
-    mae = mean_absolute_error(y_test, y_pred)
-    rmse = np.sqrt(mean_squared_error(y_test, y_pred))
-    r2 = r2_score(y_test, y_pred)
+    y_pred = X_test @ coef + intercept
+    residuals = y_test - y_pred
+    mae = float(np.mean(np.abs(residuals)))
+    rmse = float(np.sqrt(np.mean(residuals ** 2)))
+    ss_tot = float(np.sum((y_test - y_test.mean()) ** 2))
+    r2 = 1.0 - float(np.sum(residuals ** 2)) / ss_tot if ss_tot else 0.0
     
     print(f"\nBaseline Model Metrics:")
     print(f"  MAE:  ${mae:.2f}")
@@ -174,38 +271,39 @@ def build_baseline_model(df: pd.DataFrame, target_col: str = "price") -> Dict[st
     print(f"  R²:   {r2:.3f}")
     
     # Feature importance (coefficients)
-    importance = dict(zip(feature_cols, model.coef_))
+    importance = dict(zip(feature_cols, coef.tolist()))
     print(f"\nFeature Coefficients:")
-    for feat, coef in importance.items():
-        print(f"  {feat:25s}: {coef:+.4f}")
+    for feat, c in importance.items():
+        print(f"  {feat:25s}: {c:+.4f}")
     
     return {
-        "model": model,
+        "coef": coef,
         "feature_cols": feature_cols,
         "metrics": {"mae": mae, "rmse": rmse, "r2": r2},
         "importance": importance,
-        "intercept": model.intercept_
+        "intercept": intercept
     }
 
 
-def predict_demand(model_info: Dict[str, Any], new_data: pd.DataFrame) -> np.ndarray:
+def predict_demand(model_info: Dict[str, Any], new_data: Any) -> np.ndarray:
     """
     Use trained model to predict prices for new data.
-    new_data must contain feature columns.
+    new_data is a DataFrame containing the feature columns, or an array whose
+    columns are already in model_info["feature_cols"] order.
     """
-    model = model_info["model"]
-    feature_cols = model_info["feature_cols"]
-    
-    X_new = new_data[feature_cols].values
-    predictions = model.predict(X_new)
+    if isinstance(new_data, pd.DataFrame):
+        X_new = new_data[model_info["feature_cols"]].to_numpy(dtype=np.float32)
+    else:
+        X_new = np.asarray(new_data, dtype=np.float32)
     
-    return predictions
+    return X_new @ model_info["coef"] + model_info["intercept"]
 
 
 def main():
     parser = argparse.ArgumentParser(description="ML Demand Forecasting for Sneaker Releases")
     parser.add_argument("--collection", default="price_points", help="Firestore collection for price history")
     parser.add_argument("--limit", type=int, default=5000, help="Max price points to fetch")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel timestamp windows to fetch (for large limits)")
     parser.add_argument("--output", help="Optional: save trained model to file (pickle)")
     args = parser.parse_args()
     
@@ -217,7 +315,7 @@ def main():
     db = init_firestore()
     
     # Fetch price history
-    df = fetch_price_history(db, collection=args.collection, limit=args.limit)
+    df = fetch_price_history(db, collection=args.collection, limit=args.limit, workers=args.workers)
     if df.empty:
         print("No data to train on. Exiting.")
         sys.exit(1)
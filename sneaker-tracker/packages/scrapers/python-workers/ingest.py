@@ -15,100 +15,181 @@ The merge strategy is conservative:
 - Keep metadata.raw from sources for traceability.
 """
 import argparse
+import hashlib
+import itertools
 import json
 import logging
 import os
 import re
+import threading
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import lru_cache
 
+import firebase_admin
 from firebase_admin import credentials, initialize_app
 from google.cloud import firestore
 
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
 
+try:
+    from pandas import isna, to_datetime
+except ImportError:
+    to_datetime = None
+
+# Groups with at least this many date strings parse them in one vectorized
+# pandas call; smaller groups aren't worth the array setup
+VECTORIZE_MIN_DATES = 16
+
+# Stored content hashes are read back this many destination docs at a time
+HASH_PREFETCH_SIZE = 500
+
+
+@lru_cache(maxsize=1)
 def init_firebase():
-    sa_json = os.environ.get("FIREBASE_SERVICE_ACCOUNT")
-    if not sa_json:
-        raise RuntimeError("FIREBASE_SERVICE_ACCOUNT environment variable is not set")
-    sa = json.loads(sa_json)
-    cred = credentials.Certificate(sa)
-    try:
-        initialize_app(cred)
-    except ValueError:
-        pass
+    # Memoized; skips re-parsing the service account once an app exists
+    if not firebase_admin._apps:
+        sa_json = os.environ.get("FIREBASE_SERVICE_ACCOUNT")
+        if not sa_json:
+            raise RuntimeError("FIREBASE_SERVICE_ACCOUNT environment variable is not set")
+        sa = json.loads(sa_json)
+        initialize_app(credentials.Certificate(sa))
     return firestore.Client()
 
 
+_NORMALIZE_RE = re.compile(r"[^a-z0-9]+")
+
+
 def normalize_name(name: str) -> str:
     if not name:
         return ""
-    n = name.lower()
-    n = re.sub(r"[^a-z0-9]+", " ", n)
-    n = re.sub(r"\s+", " ", n).strip()
-    return n
-
-
-def merge_docs(docs):
-    # docs: list of dicts representing scraped documents
-    merged = {}
-    names = [d.get("name") for d in docs if d.get("name")]
-    merged["name"] = names[0] if names else None
-    merged["sku"] = next((d.get("sku") for d in docs if d.get("sku")), None)
-    merged["brand"] = next((d.get("brand") for d in docs if d.get("brand")), None)
-    # pick latest release_date
-    dates = [d.get("release_date") for d in docs if d.get("release_date")]
-    release_date = None
-    if dates:
-        # dates may be strings or datetimes
-        parsed = []
-        for dt in dates:
-            if isinstance(dt, str):
-                try:
-                    parsed.append(datetime.fromisoformat(dt))
-                except Exception:
-                    pass
-            else:
-                parsed.append(dt)
-        if parsed:
-            release_date = max(parsed)
-    merged["release_date"] = release_date
-
-    # union locations and sources
-    locations = []
-    sources = []
-    for d in docs:
+    # Each run of other characters becomes one space, so no whitespace
+    # collapsing pass is needed afterwards
+    return _NORMALIZE_RE.sub(" ", name.lower()).strip()
+
+
+def _dedup_key(item):
+    """Hashable identity for de-duplicating merged list entries."""
+    try:
+        hash(item)
+        return (0, item)
+    except TypeError:
+        # Unhashable entries (e.g. location dicts) are keyed by their JSON
+        return (1, json.dumps(item, sort_keys=True, default=str))
+
+
+# status: prefer live > upcoming > announced
+STATUS_PRIORITY = {"live": 3, "upcoming": 2, "announced": 1}
+
+
+class GroupAccumulator:
+    """Running merge of one group's documents.
+
+    Documents are folded in one at a time with add(), so a group never has
+    to be held as a list of full documents; merged() builds the merged doc.
+    """
+
+    def __init__(self):
+        self.name = None
+        self.sku = None
+        self.brand = None
+        self.dates = []
+        self.locations = {}
+        self.sources = {}
+        self.status = None
+        self.raw_sources = []
+
+    def add(self, d):
+        # first non-empty name / sku / brand wins
+        self.name = self.name or d.get("name") or None
+        self.sku = self.sku or d.get("sku") or None
+        self.brand = self.brand or d.get("brand") or None
+        if d.get("release_date"):
+            self.dates.append(d["release_date"])
+        # union locations and sources (unique, order of first appearance)
         for loc in d.get("locations") or []:
-            if loc not in locations:
-                locations.append(loc)
+            self.locations.setdefault(_dedup_key(loc), loc)
         for s in d.get("sources") or []:
-            if s not in sources:
-                sources.append(s)
-    merged["locations"] = locations
-    merged["sources"] = sources
+            self.sources.setdefault(_dedup_key(s), s)
+        status = d.get("status")
+        if status and (self.status is None
+                       or STATUS_PRIORITY.get(status, 0) > STATUS_PRIORITY.get(self.status, 0)):
+            self.status = status
+        # keep raw metadata list for traceability
+        if d.get("metadata"):
+            self.raw_sources.append(d.get("metadata", {}).get("raw"))
+
+    def merged(self, ts=None):
+        # ts: merge timestamp, shared by every group of one ingest run
+        merged = {}
+        merged["name"] = self.name
+        merged["sku"] = self.sku
+        merged["brand"] = self.brand
+        # pick latest release_date
+        release_date = None
+        if self.dates:
+            # dates may be strings or datetimes
+            strings = [dt for dt in self.dates if isinstance(dt, str)]
+            parsed = [dt for dt in self.dates if not isinstance(dt, str)]
+            if to_datetime is not None and len(strings) >= VECTORIZE_MIN_DATES:
+                # Unparseable strings become NaT, which max() skips
+                latest = to_datetime(strings, errors="coerce", utc=True, format="ISO8601").max()
+                if not isna(latest):
+                    parsed.append(latest.to_pydatetime())
+            else:
+                for dt in strings:
+                    try:
+                        parsed.append(datetime.fromisoformat(dt))
+                    except Exception:
+                        pass
+            # pandas returns UTC-aware datetimes; read naive ones as UTC too
+            # so both paths agree and max() can compare them
+            parsed = [
+                dt.replace(tzinfo=timezone.utc)
+                if isinstance(dt, datetime) and dt.tzinfo is None else dt
+                for dt in parsed
+            ]
+            if parsed:
+                release_date = max(parsed)
+        merged["release_date"] = release_date
+        merged["locations"] = list(self.locations.values())
+        merged["sources"] = list(self.sources.values())
+        merged["status"] = self.status
+        merged["raw_sources"] = self.raw_sources
+        merged["last_merged_at"] = ts or datetime.now(timezone.utc)
+        return merged
+
 
-    # status: prefer live > upcoming > announced
-    status_priority = {"live": 3, "upcoming": 2, "announced": 1}
-    statuses = [d.get("status") for d in docs if d.get("status")]
-    merged_status = None
-    if statuses:
-        merged_status = max(statuses, key=lambda s: status_priority.get(s, 0))
-    merged["status"] = merged_status
+def merge_docs(docs, ts=None):
+    # docs: iterable of dicts representing scraped documents
+    acc = GroupAccumulator()
+    for d in docs:
+        acc.add(d)
+    return acc.merged(ts)
 
-    # keep raw metadata list for traceability
-    merged["raw_sources"] = [d.get("metadata", {}).get("raw") for d in docs if d.get("metadata")]
 
-    merged["last_merged_at"] = datetime.utcnow()
-    return merged
+def content_hash(merged):
+    """Stable hash of a merged doc's content, ignoring bookkeeping fields."""
+    body = {k: v for k, v in merged.items() if k not in ("last_merged_at", "_content_hash")}
+    data = json.dumps(body, sort_keys=True, default=str).encode()
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
 
 
 def run_ingest(source_collection, dest_collection, dry_run=False):
     db = init_firebase()
     src = db.collection(source_collection)
-    docs = list(src.stream())
-    logging.info("Read %d documents from %s", len(docs), source_collection)
 
-    groups = defaultdict(list)
-    for doc in docs:
+    # Stream the source collection, folding each document into its group's
+    # accumulator as it arrives instead of loading every document first.
+    groups = defaultdict(GroupAccumulator)
+    read_count = 0
+    for doc in src.stream():
         data = doc.to_dict() or {}
         sku = data.get("sku")
         name = data.get("name")
@@ -116,21 +197,69 @@ def run_ingest(source_collection, dest_collection, dry_run=False):
             key = f"sku::{sku}"
         else:
             key = f"name::{normalize_name(name)}"
-        groups[key].append(data)
+        groups[key].add(data)
+        read_count += 1
+    logging.info("Read %d documents from %s", read_count, source_collection)
 
     logging.info("Found %d groups to merge", len(groups))
     dest = db.collection(dest_collection)
     merged_count = 0
-    for key, group in groups.items():
-        merged = merge_docs(group)
-        # create doc id as normalized key
-        doc_id = key.replace(" ", "_")
-        if dry_run:
-            logging.info("Dry run: would write %s -> %s", doc_id, merged.get("name"))
-        else:
-            dest.document(doc_id).set(merged, merge=True)
-            merged_count += 1
-    logging.info("Ingestion complete. Merged %d groups.", merged_count)
+    unchanged_count = 0
+
+    # Upserts are queued on a BulkWriter, which batches and commits them in
+    # parallel instead of one round trip per group.
+    bw = None if dry_run else db.bulk_writer()
+    if bw is not None:
+        # Callbacks fire on BulkWriter's worker threads
+        count_lock = threading.Lock()
+
+        def on_result(ref, result, writer):
+            nonlocal merged_count
+            with count_lock:
+                merged_count += 1
+
+        def on_error(error, writer):
+            logging.error("Failed to write %s: %s", error.operation.reference.id, error.message)
+            # Let BulkWriter retry transient failures a few times
+            return error.attempts < 3
+
+        bw.on_write_result(on_result)
+        bw.on_write_error(on_error)
+
+    batch_ts = datetime.now(timezone.utc)
+    items = iter(groups.items())
+    try:
+        while chunk := list(itertools.islice(items, HASH_PREFETCH_SIZE)):
+            pending = []
+            for key, acc in chunk:
+                merged = acc.merged(batch_ts)
+                # create doc id as normalized key
+                doc_id = key.replace(" ", "_")
+                if dry_run:
+                    logging.info("Dry run: would write %s -> %s", doc_id, merged.get("name"))
+                else:
+                    merged["_content_hash"] = content_hash(merged)
+                    pending.append((dest.document(doc_id), merged))
+            if not pending:
+                continue
+
+            # Skip groups whose content matches what is already stored; the
+            # stored hashes for the whole chunk come back in one batched read
+            stored = {
+                snap.id: (snap.to_dict() or {}).get("_content_hash")
+                for snap in db.get_all([ref for ref, _ in pending], field_paths=["_content_hash"])
+                if snap.exists
+            }
+            for ref, merged in pending:
+                if stored.get(ref.id) == merged["_content_hash"]:
+                    unchanged_count += 1
+                else:
+                    bw.set(ref, merged, merge=True)
+    finally:
+        if bw is not None:
+            bw.close()
+    logging.info("Ingestion complete. Merged %d groups, skipped %d unchanged.",
+                 merged_count, unchanged_count)
 
 
 def main():
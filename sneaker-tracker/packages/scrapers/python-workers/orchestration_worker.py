@@ -5,6 +5,7 @@ Orchestration worker for scheduled background tasks.
 Environment variables required:
 - FIREBASE_SERVICE_ACCOUNT: full JSON content of a Firebase service account (string)
 - ML_API_KEY: API key for optional ML service (optional)
+- ML_WORKERS: max concurrent ML API calls (optional, default 32)
 
 This script connects to Firestore via the admin credentials and updates
 documents in the `sneakers` collection. It will attempt to call an ML API
@@ -12,31 +13,54 @@ to compute an increment per sneaker; if the ML call fails or ML_API_KEY is
 missing it will increment by 1 as a safe fallback.
 
 Install dependencies:
-  pip install firebase-admin google-cloud-firestore requests
+  pip install firebase-admin google-cloud-firestore requests orjson
 """
 import os
-import json
 import logging
+import queue
+import threading
+from functools import lru_cache
+
+import firebase_admin
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from firebase_admin import credentials, initialize_app
 from google.cloud import firestore
 
-
+# Shared keep-alive session for ML API calls so each document does not pay
+# for a fresh TCP/TLS handshake. The ML call only computes a value, so POSTs
+# are retried on 429/5xx, honoring Retry-After.
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=1.0,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True,
+    ),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
+@lru_cache(maxsize=1)
 def init_firebase():
-    sa_json = os.environ.get("FIREBASE_SERVICE_ACCOUNT")
-    if not sa_json:
-        raise RuntimeError("FIREBASE_SERVICE_ACCOUNT environment variable is not set")
-    try:
-        sa = json.loads(sa_json)
-    except Exception as e:
-        raise RuntimeError("FIREBASE_SERVICE_ACCOUNT does not contain valid JSON: %s" % e)
+    # Memoized: the service account JSON is parsed and the Firestore client
+    # built once per process, however many helpers ask for it.
+    if not firebase_admin._apps:
+        sa_json = os.environ.get("FIREBASE_SERVICE_ACCOUNT")
+        if not sa_json:
+            raise RuntimeError("FIREBASE_SERVICE_ACCOUNT environment variable is not set")
+        try:
+            sa = orjson.loads(sa_json)
+        except Exception as e:
+            raise RuntimeError("FIREBASE_SERVICE_ACCOUNT does not contain valid JSON: %s" % e)
 
-    cred = credentials.Certificate(sa)
-    try:
-        initialize_app(cred)
-    except ValueError:
-        # already initialized in this runtime
-        pass
+        initialize_app(credentials.Certificate(sa))
     # The google-cloud-firestore client will use the application default
     # credentials initialized by firebase_admin above.
     return firestore.Client()
@@ -58,9 +82,11 @@ def compute_increment_via_ml(ml_api_key, sneaker_doc):
     try:
         payload = {"features": sneaker_doc}
         headers = {"Authorization": f"Bearer {ml_api_key}", "Content-Type": "application/json"}
-        resp = requests.post(ml_api_url, json=payload, headers=headers, timeout=ml_timeout)
+        # default=str covers Firestore values orjson can't encode natively
+        body = orjson.dumps(payload, default=str)
+        resp = SESSION.post(ml_api_url, data=body, headers=headers, timeout=ml_timeout)
         resp.raise_for_status()
-        data = resp.json()
+        data = orjson.loads(resp.content)
         # Accept either top-level 'increment' or 'result.increment'
         increment = None
         if isinstance(data, dict):
@@ -84,32 +110,78 @@ def main():
     ml_api_url = os.environ.get("ML_API_URL")
     # Timeout for ML calls (seconds)
     ml_timeout = int(os.environ.get("ML_TIMEOUT", "10"))
+    # ML calls are I/O-bound, so run them on a pool of consumer threads
+    ml_workers = int(os.environ.get("ML_WORKERS", "32"))
 
     # allow configurable collection name (default: sneakers)
     collection_name = os.environ.get("FIRESTORE_COLLECTION", "sneakers")
     sneakers_ref = db.collection(collection_name)
-    docs = list(sneakers_ref.stream())
-    if not docs:
-        logging.info("No documents found in `sneakers` collection. Nothing to do.")
-        return
 
+    # Updates are queued on a BulkWriter, which groups them into batched
+    # commits instead of one round trip per document.
+    bw = db.bulk_writer()
     updated = 0
-    for doc in docs:
-        data = doc.to_dict() or {}
-        mileage = data.get("mileage", 0)
-        # Use ML to determine increment where available
-        inc = compute_increment_via_ml(ml_api_key, data)
-        new_mileage = mileage + inc
-        try:
-            sneakers_ref.document(doc.id).update({
-                "mileage": new_mileage,
-                "last_updated": firestore.SERVER_TIMESTAMP,
-            })
-            logging.info("Updated %s: %s -> %s", doc.id, mileage, new_mileage)
-            updated += 1
-        except Exception as e:
-            logging.error("Failed to update %s: %s", doc.id, e)
+    # Callbacks fire on BulkWriter's worker threads
+    updated_lock = threading.Lock()
 
+    def on_result(ref, result, writer):
+        nonlocal updated
+        with updated_lock:
+            updated += 1
+        logging.debug("Updated %s", ref.id)
+
+    def on_error(error, writer):
+        logging.error("Failed to update %s: %s", error.operation.reference.id, error.message)
+        # Let BulkWriter retry transient failures a few times
+        return error.attempts < 3
+
+    bw.on_write_result(on_result)
+    bw.on_write_error(on_error)
+
+    # Pipeline: this thread streams documents into a bounded queue while
+    # consumer threads call the ML API and queue updates on the BulkWriter,
+    # so reads, ML calls and writes overlap instead of running in phases.
+    work = queue.Queue(maxsize=1000)
+    bw_lock = threading.Lock()
+
+    def consume():
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            doc_id, data = item
+            try:
+                mileage = data.get("mileage", 0)
+                # Use ML to determine increment where available
+                new_mileage = mileage + compute_increment_via_ml(ml_api_key, data)
+                with bw_lock:
+                    bw.update(sneakers_ref.document(doc_id), {
+                        "mileage": new_mileage,
+                        "last_updated": firestore.SERVER_TIMESTAMP,
+                    })
+                logging.debug("Queued %s: %s -> %s", doc_id, mileage, new_mileage)
+            except Exception as e:
+                logging.error("Failed to update %s: %s", doc_id, e)
+
+    consumers = [threading.Thread(target=consume, daemon=True) for _ in range(ml_workers)]
+    for t in consumers:
+        t.start()
+
+    streamed = 0
+    try:
+        for doc in sneakers_ref.stream():
+            work.put((doc.id, doc.to_dict() or {}))
+            streamed += 1
+    finally:
+        for _ in consumers:
+            work.put(None)
+        for t in consumers:
+            t.join()
+        bw.close()
+
+    if not streamed:
+        logging.info("No documents found in `sneakers` collection. Nothing to do.")
+        return
     logging.info("Orchestration complete. Documents updated: %d", updated)
 
 
@@ -5,12 +5,52 @@ WARNING: Requires account authentication for full data access
 """
 
 import asyncio
+import re
 from typing import List, Dict, Any
 from datetime import datetime
+from urllib.parse import urljoin
 import json
 
-from base_scraper import BaseSneakerScraper
-from playwright.async_api import Page
+from base_scraper import BaseSneakerScraper, close_browser, get_browser
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
+
+# First URL path segment of 6+ characters containing a digit
+STYLE_CODE_URL_RE = re.compile(r'(?:^|/)(?=[^/]{6})([^/]*\d[^/]*)')
+
+ADIDAS_ORIGIN = "https://www.adidas.com/"
+
+PRODUCT_CARD_SELECTOR = '[data-auto-id="product-card"]'
+
+# Release-type phrases and the status each one maps to
+_STATUS_RE = re.compile(r'(available now|buy now|sold out|closed)')
+_STATUS_MAP = {
+    'available now': 'available',
+    'buy now': 'available',
+    'sold out': 'sold_out',
+    'closed': 'sold_out',
+}
+
+# Product-listing JSON the page fetches on load
+PRODUCT_API_URL_RE = re.compile(r'/api/products|plp-app')
+
+# Pulls every product card's fields plus any server-rendered state in one
+# browser round-trip
+EXTRACT_CARDS_JS = """
+(selector) => ({
+    cards: Array.from(document.querySelectorAll(selector)).map(el => {
+        const text = (sel) => el.querySelector(sel)?.innerText ?? null;
+        return {
+            name: text('[data-auto-id="product-name"]'),
+            priceText: text('[data-auto-id="product-price"]'),
+            imageUrl: el.querySelector('img')?.getAttribute('src') ?? null,
+            productUrl: el.querySelector('a')?.getAttribute('href') ?? null,
+            releaseType: text('[data-auto-id="release-type"]') ?? 'unknown',
+            dateText: text('[data-auto-id="release-date"]'),
+        };
+    }),
+    stateProducts: window.__INITIAL_STATE__?.products ?? null,
+})
+"""
 
 class AdidasConfirmedScraper(BaseSneakerScraper):
     """
@@ -39,71 +79,100 @@ class AdidasConfirmedScraper(BaseSneakerScraper):
             supabase_table="sneaker_releases",
             headless=True
         )
+        # Product JSON captured from network responses during page load
+        self._captured_api: List[Dict[str, Any]] = []
+        # Product cards that failed to parse in the last scrape
+        self._parse_errors = 0
     
     async def scrape_releases(self, page: Page) -> List[Dict[str, Any]]:
         """Scrape Confirmed app releases"""
         releases = []
+        self._captured_api = []
+        self._parse_errors = 0
+        capture_tasks = []
+        
+        async def maybe_capture(response):
+            if not PRODUCT_API_URL_RE.search(response.url):
+                return
+            try:
+                data = await response.json()
+            except Exception:
+                return  # Not JSON (or body no longer available)
+            if isinstance(data, dict) and isinstance(data.get("products"), list):
+                self._captured_api.extend(data["products"])
+        
+        def on_response(response):
+            capture_tasks.append(asyncio.create_task(maybe_capture(response)))
         
         try:
+            # Listen before navigating so the listing JSON is captured on the
+            # initial load rather than re-read from the page afterwards
+            page.on("response", on_response)
+            
             # Navigate to Confirmed releases page
             self.logger.info(f"Loading Confirmed releases for {self.region}")
             await page.goto(self.base_url, wait_until="networkidle", timeout=30000)
+            await asyncio.gather(*capture_tasks)
+            
+            # Prefer the structured API data over DOM scraping
+            if self._captured_api:
+                releases = self._releases_from_api(self._captured_api)
+                self.logger.info(f"Captured {len(releases)} products from API responses")
+                return releases
             
-            # Wait for product grid
-            await page.wait_for_selector('[data-auto-id="product-card"]', timeout=10000)
+            # Wait for product grid (the embedded state may still have products)
+            try:
+                await page.wait_for_selector(PRODUCT_CARD_SELECTOR, timeout=10000)
+            except PlaywrightTimeoutError:
+                self.logger.info("Product grid not found; checking page state")
             
-            # Extract product cards
-            products = await page.query_selector_all('[data-auto-id="product-card"]')
-            self.logger.info(f"Found {len(products)} product cards")
+            # Cards and __INITIAL_STATE__ come back from a single evaluate call
+            bundle = await page.evaluate(EXTRACT_CARDS_JS, PRODUCT_CARD_SELECTOR)
+            cards = bundle["cards"]
+            state_products = bundle["stateProducts"]
+            self.logger.info(f"Found {len(cards)} product cards")
             
-            for product in products:
-                try:
-                    release_data = await self._extract_product_data(page, product)
-                    if release_data:
-                        releases.append(release_data)
-                        
-                except Exception as e:
-                    self.logger.warning(f"Failed to extract product: {e}")
-                    continue
+            # The embedded state is structured and doesn't drop cards with
+            # missing DOM fields, so prefer it when present
+            if state_products:
+                self.logger.info(f"Using {len(state_products)} products from page state")
+                return self._releases_from_api(state_products)
             
-            # Alternative: Try API endpoint
-            if len(releases) == 0:
-                self.logger.info("Trying API endpoint...")
-                releases = await self._fetch_via_api(page)
+            releases = [
+                release for card in cards
+                if (release := self._safe_from_dict(card)) is not None
+            ]
+            if self._parse_errors:
+                self.logger.warning(f"Failed to extract {self._parse_errors} of {len(cards)} products")
             
         except Exception as e:
             self.logger.error(f"Confirmed scraping failed: {e}")
+        finally:
+            page.remove_listener("response", on_response)
         
         return releases
     
-    async def _extract_product_data(self, page: Page, product_el) -> Dict[str, Any]:
-        """Extract data from a single product card"""
-        # Product name
-        name_el = await product_el.query_selector('[data-auto-id="product-name"]')
-        name = await name_el.inner_text() if name_el else None
+    def _safe_from_dict(self, card: Dict[str, Any]) -> Dict[str, Any]:
+        """_extract_product_data, counting failures instead of raising"""
+        try:
+            return self._extract_product_data(card)
+        except Exception:
+            self._parse_errors += 1
+            return None
+    
+    def _extract_product_data(self, card: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a release from one card's fields (as returned by EXTRACT_CARDS_JS)"""
+        name = card.get("name")
         
         if not name:
             return None
         
-        # Price
-        price_el = await product_el.query_selector('[data-auto-id="product-price"]')
-        price_text = await price_el.inner_text() if price_el else None
-        
-        # Image
-        image_el = await product_el.query_selector('img')
-        image_url = await image_el.get_attribute('src') if image_el else None
-        
-        # Product link
-        link_el = await product_el.query_selector('a')
-        product_url = await link_el.get_attribute('href') if link_el else None
-        
+        price_text = card.get("priceText")
+        image_url = card.get("imageUrl")
+        product_url = card.get("productUrl")
         # Release type (raffle, FCFS, etc.)
-        release_type_el = await product_el.query_selector('[data-auto-id="release-type"]')
-        release_type = await release_type_el.inner_text() if release_type_el else "unknown"
-        
-        # Release date
-        date_el = await product_el.query_selector('[data-auto-id="release-date"]')
-        date_text = await date_el.inner_text() if date_el else None
+        release_type = card.get("releaseType") or "unknown"
+        date_text = card.get("dateText")
         
         # Extract style code from URL or name
         style_code = self._extract_style_code(product_url, name)
@@ -113,7 +182,7 @@ class AdidasConfirmedScraper(BaseSneakerScraper):
             "style_code": style_code,
             "retail_price": self._parse_price(price_text),
             "image_url": image_url,
-            "product_url": f"https://www.adidas.com{product_url}" if product_url and product_url.startswith('/') else product_url,
+            "product_url": urljoin(ADIDAS_ORIGIN, product_url) if product_url else None,
             "brand": "Adidas",
             "status": self._determine_status(release_type, date_text),
             "scraped_url": self.base_url,
@@ -123,55 +192,34 @@ class AdidasConfirmedScraper(BaseSneakerScraper):
             "is_raffle": "raffle" in release_type.lower() or "draw" in release_type.lower()
         }
     
-    async def _fetch_via_api(self, page: Page) -> List[Dict[str, Any]]:
-        """
-        Fallback: Try to fetch releases via adidas API
-        Note: May require authentication
-        """
-        releases = []
-        
-        try:
-            # Intercept API calls
-            api_data = await page.evaluate("""
-                () => {
-                    // Look for window.__INITIAL_STATE__ or similar
-                    if (window.__INITIAL_STATE__) {
-                        return window.__INITIAL_STATE__;
-                    }
-                    return null;
-                }
-            """)
-            
-            if api_data and "products" in api_data:
-                for product in api_data["products"]:
-                    releases.append({
-                        "shoe_name": product.get("name"),
-                        "style_code": product.get("productCode") or product.get("sku"),
-                        "retail_price": product.get("price"),
-                        "image_url": product.get("image"),
-                        "product_url": product.get("url"),
-                        "brand": "Adidas",
-                        "status": product.get("availabilityStatus", "upcoming"),
-                        "scraped_url": self.base_url
-                    })
-        
-        except Exception as e:
-            self.logger.warning(f"API fetch failed: {e}")
-        
-        return releases
+    def _releases_from_api(self, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Map adidas API / page-state product objects to releases"""
+        return [
+            {
+                "shoe_name": product.get("name"),
+                "style_code": product.get("productCode") or product.get("sku"),
+                "retail_price": product.get("price"),
+                "image_url": product.get("image"),
+                "product_url": product.get("url"),
+                "brand": "Adidas",
+                "status": product.get("availabilityStatus", "upcoming"),
+                "scraped_url": self.base_url
+            }
+            for product in products
+            if product.get("name")
+        ]
     
     def _extract_style_code(self, url: str, name: str) -> str:
         """Extract style code from URL or name"""
         # Try URL first
         if url:
-            parts = url.split('/')
-            for part in parts:
-                if part and len(part) > 5 and any(c.isdigit() for c in part):
-                    return part
+            match = STYLE_CODE_URL_RE.search(url)
+            if match:
+                return match.group(1)
         
         # Try to find in name (format: NAME - CODE)
         if ' - ' in name:
-            potential_code = name.split(' - ')[-1].strip()
+            potential_code = name.rpartition(' - ')[2].strip()
             if len(potential_code) < 20:  # Reasonable style code length
                 return potential_code
         
@@ -182,14 +230,8 @@ class AdidasConfirmedScraper(BaseSneakerScraper):
         if not release_type:
             return "upcoming"
         
-        release_type_lower = release_type.lower()
-        
-        if "available now" in release_type_lower or "buy now" in release_type_lower:
-            return "available"
-        elif "sold out" in release_type_lower or "closed" in release_type_lower:
-            return "sold_out"
-        else:
-            return "upcoming"
+        match = _STATUS_RE.search(release_type.lower())
+        return _STATUS_MAP[match.group(1)] if match else "upcoming"
     
     def _parse_date(self, date_text: str) -> str:
         """Parse release date to ISO format"""
@@ -202,35 +244,56 @@ class AdidasConfirmedScraper(BaseSneakerScraper):
         return date_text
     
     def normalize_release(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Override to add Confirmed-specific fields"""
-        normalized = super().normalize_release(raw_data)
-        
-        # Add Confirmed-specific fields
-        normalized["release_type"] = raw_data.get("release_type", "standard")
-        normalized["is_raffle"] = raw_data.get("is_raffle", False)
-        normalized["region"] = raw_data.get("region", self.region)
-        
-        return normalized
+        """Override to add Confirmed-specific fields (base schema + Confirmed fields in one dict)"""
+        return {
+            "shoe_name": raw_data.get("shoe_name", "").strip(),
+            "release_date": raw_data.get("release_date"),
+            "retail_price": self._parse_price(raw_data.get("retail_price")),
+            "style_code": raw_data.get("style_code"),
+            "image_url": raw_data.get("image_url"),
+            "product_url": raw_data.get("product_url"),
+            "brand": raw_data.get("brand", "Unknown"),
+            "status": raw_data.get("status", "upcoming"),
+            "scraped_url": raw_data.get("scraped_url", self.base_url),
+            "scraper_name": self.scraper_name,
+            "scraped_at": datetime.utcnow().isoformat(),
+            # Confirmed-specific fields
+            "release_type": raw_data.get("release_type", "standard"),
+            "is_raffle": raw_data.get("is_raffle", False),
+            "region": raw_data.get("region", self.region)
+        }
 
 
 # Multi-region scraper
-async def scrape_all_regions():
-    """Scrape all Confirmed regions"""
-    all_stats = {}
+async def scrape_all_regions(max_concurrent: int = 3):
+    """Scrape all Confirmed regions concurrently on one shared browser"""
+    regions = list(AdidasConfirmedScraper.REGIONS)
+    scrapers = [AdidasConfirmedScraper(region=region) for region in regions]
+    # Bound concurrency to stay clear of per-IP rate limits
+    sem = asyncio.Semaphore(max_concurrent)
     
-    for region in ["US", "EU", "DE"]:
-        print(f"\n🌍 Scraping {region} region...")
-        scraper = AdidasConfirmedScraper(region=region)
-        stats = await scraper.run()
-        all_stats[region] = stats
-        
-        # Delay between regions
-        await asyncio.sleep(5)
+    async def scrape_region(scraper: AdidasConfirmedScraper, browser) -> Dict[str, Any]:
+        async with sem:
+            print(f"\n🌍 Scraping {scraper.region} region...")
+            # Each region gets its own lightweight context on the shared browser
+            return await scraper.run_with_browser(browser)
+    
+    browser = await get_browser(scrapers[0])
+    try:
+        results = await asyncio.gather(
+            *(scrape_region(scraper, browser) for scraper in scrapers),
+            return_exceptions=True
+        )
+    finally:
+        await close_browser()
     
     # Print summary
     print(f"\n✅ All Regions Complete!")
-    for region, stats in all_stats.items():
-        print(f"{region}: {stats['releases_found']} found, {stats['releases_inserted']} inserted")
+    for region, stats in zip(regions, results):
+        if isinstance(stats, Exception):
+            print(f"{region}: failed ({stats})")
+        else:
+            print(f"{region}: {stats['releases_found']} found, {stats['releases_inserted']} inserted")
 
 
 # Example usage
@@ -243,7 +306,10 @@ async def main():
         await scrape_all_regions()
     else:
         scraper = AdidasConfirmedScraper(region=region)
-        stats = await scraper.run()
+        try:
+            stats = await scraper.run()
+        finally:
+            await close_browser()
         
         print(f"\n✅ adidas Confirmed ({region}) Scraping Complete!")
         print(f"Releases Found: {stats['releases_found']}")
@@ -252,4 +318,10 @@ async def main():
 
 
 if __name__ == "__main__":
+    # Optional: libuv-based event loop for faster socket I/O
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
     asyncio.run(main())
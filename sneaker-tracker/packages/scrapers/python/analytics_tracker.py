@@ -6,7 +6,8 @@ Features:
 - Event tracking (scraper runs, errors, product counts)
 - Session tracking
 - Custom dimensions for source/brand filtering
-- Batch event sending
+- Batch event sending (sync events are queued and sent in background batches)
+- Async, fire-and-forget sending from scraper coroutines (httpx)
 
 Usage:
     from analytics_tracker import AnalyticsTracker
@@ -20,24 +21,98 @@ Usage:
     )
 """
 
+import asyncio
+import atexit
+import functools
 import os
 import json
 import logging
+import queue
+import threading
 import time
-from datetime import datetime
 from typing import Dict, List, Optional, Any
+from urllib.parse import urlencode
 import uuid
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
     REQUESTS_AVAILABLE = True
 except ImportError:
     REQUESTS_AVAILABLE = False
     logging.warning("requests library not available")
 
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def _dumps(payload: Dict[str, Any]) -> bytes:
+    """Serialize a GA4 payload to JSON bytes (orjson when installed)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload, default=str)
+    return json.dumps(payload, default=str, separators=(",", ":")).encode("utf-8")
+
+
+def _timestamp_micros() -> str:
+    """Current time in GA4's timestamp_micros format."""
+    return str(int(time.time() * 1_000_000))
+
+
+def _latency_stats(latencies):
+    """Mean, standard deviation and 95th percentile of a float64 array."""
+    return latencies.mean(), latencies.std(), np.percentile(latencies, 95)
+
+
+if NUMBA_AVAILABLE and NUMPY_AVAILABLE:
+    # Compiled once and cached on disk, so later runs skip the JIT
+    _latency_stats = njit(cache=True)(_latency_stats)
+
+
+CLIENT_ID_FILE = os.path.join(os.path.dirname(__file__), '.analytics_client_id')
+
+
+@functools.lru_cache(maxsize=1)
+def _load_or_create_client_id(path: str) -> str:
+    """Load the persisted client ID, or generate and save one (cached per process)."""
+    # Try to load from file, or generate new
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return f.read().strip()
+    
+    client_id = str(uuid.uuid4())
+    try:
+        with open(path, 'w') as f:
+            f.write(client_id)
+    except OSError:
+        pass  # File write failed, not critical
+    return client_id
+
 
 class AnalyticsTracker:
     """Google Analytics 4 event tracker for Python scrapers."""
@@ -46,6 +121,11 @@ class AnalyticsTracker:
     GA4_ENDPOINT = "https://www.google-analytics.com/mp/collect"
     GA4_DEBUG_ENDPOINT = "https://www.google-analytics.com/debug/mp/collect"
     
+    # GA4 accepts at most 25 events per request
+    BATCH_SIZE = 25
+    # How long the drain thread waits to fill a batch before sending
+    BATCH_WAIT_SECONDS = 0.5
+    
     def __init__(self, measurement_id: str = None, api_secret: str = None, 
                  client_id: str = None, debug: bool = False):
         """
@@ -68,43 +148,54 @@ class AnalyticsTracker:
             raise ValueError("measurement_id and api_secret required (or set GA_MEASUREMENT_ID and GA_API_SECRET env vars)")
         
         # Generate or load client ID (persistent identifier for this scraper instance)
-        if client_id:
-            self.client_id = client_id
-        else:
-            # Try to load from file, or generate new
-            client_id_file = os.path.join(os.path.dirname(__file__), '.analytics_client_id')
-            if os.path.exists(client_id_file):
-                with open(client_id_file, 'r') as f:
-                    self.client_id = f.read().strip()
-            else:
-                self.client_id = str(uuid.uuid4())
-                try:
-                    with open(client_id_file, 'w') as f:
-                        f.write(self.client_id)
-                except:
-                    pass  # File write failed, not critical
+        self.client_id = client_id or _load_or_create_client_id(CLIENT_ID_FILE)
+        
+        # Full collect URL with credentials, built once rather than per request
+        endpoint = self.GA4_DEBUG_ENDPOINT if debug else self.GA4_ENDPOINT
+        self._endpoint_url = f"{endpoint}?" + urlencode({
+            "measurement_id": self.measurement_id,
+            "api_secret": self.api_secret
+        })
         
         # Session tracking
         self.session_id = str(int(time.time() * 1000))  # Unix timestamp in milliseconds
         
-        logger.info(f"Analytics initialized: {self.measurement_id} (client: {self.client_id[:8]}...)")
-    
-    def _send_event(self, event_name: str, event_params: Dict = None) -> bool:
-        """
-        Send event to GA4 via Measurement Protocol.
+        # Fields shared by every payload, built once; each send shallow-copies
+        # the skeleton and adds its own events
+        self._user_properties = {
+            "scraper_environment": {
+                "value": os.getenv('ENV', 'production')
+            }
+        }
+        self._payload_skeleton = {
+            "client_id": self.client_id,
+            "user_properties": self._user_properties
+        }
         
-        Args:
-            event_name: Event name (e.g., 'scraper_run', 'scraper_error')
-            event_params: Event parameters dictionary
-            
-        Returns:
-            True if successful, False otherwise
-        """
-        endpoint = self.GA4_DEBUG_ENDPOINT if self.debug else self.GA4_ENDPOINT
+        # Keep-alive HTTP session so events reuse one pooled TLS connection
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+        self._session.headers.update(JSON_HEADERS)
         
-        # Build payload
-        payload = {
-            "client_id": self.client_id,
+        # Async client (created lazily inside the running loop) and the
+        # fire-and-forget send tasks still in flight
+        self._aio_client = None
+        self._pending_tasks = set()
+        
+        # Sync events are queued and drained by a daemon thread that sends
+        # them in batches of up to BATCH_SIZE, so callers never block on GA4
+        self._queue = queue.Queue(maxsize=1000)
+        threading.Thread(target=self._drain, name="ga4-drain", daemon=True).start()
+        atexit.register(self.flush)
+        
+        logger.info(f"Analytics initialized: {self.measurement_id} (client: {self.client_id[:8]}...)")
+    
+    def _build_event_payload(self, event_name: str, event_params: Dict = None) -> Dict[str, Any]:
+        """Build the Measurement Protocol payload for a single event."""
+        return {
+            **self._payload_skeleton,
+            # GA4 records the event time from this; one time.time() call
+            "timestamp_micros": _timestamp_micros(),
             "events": [
                 {
                     "name": event_name,
@@ -116,44 +207,110 @@ class AnalyticsTracker:
                 }
             ]
         }
+    
+    def _handle_event_response(self, event_name: str, response: Any) -> bool:
+        """Log a GA4 response (requests or httpx) and report success."""
+        if self.debug:
+            # Debug endpoint returns validation messages
+            debug_response = response.json()
+            if debug_response.get('validationMessages'):
+                logger.warning(f"GA4 validation messages: {debug_response['validationMessages']}")
+            else:
+                logger.debug("GA4 event validated successfully")
         
-        # Add user properties (optional)
-        payload["user_properties"] = {
-            "scraper_environment": {
-                "value": os.getenv('ENV', 'production')
-            }
-        }
+        if response.status_code == 204 or response.status_code == 200:
+            logger.debug(f"Sent GA4 event: {event_name}")
+            return True
+        else:
+            logger.error(f"GA4 event failed: {response.status_code} - {response.text}")
+            return False
+    
+    def _send_event(self, event_name: str, event_params: Dict = None) -> bool:
+        """
+        Queue event for background sending to GA4.
+        
+        In debug mode the event is sent immediately so validation messages
+        are reported inline.
+        
+        Args:
+            event_name: Event name (e.g., 'scraper_run', 'scraper_error')
+            event_params: Event parameters dictionary
+            
+        Returns:
+            True if queued (or, in debug mode, sent) successfully
+        """
+        if self.debug:
+            return self._post_event(event_name, event_params)
+        
+        # Stamp at enqueue time so batching delay doesn't shift the event time
+        self._queue.put({
+            "name": event_name,
+            "params": event_params or {},
+            "timestamp_micros": _timestamp_micros(),
+        })
+        return True
+    
+    def _post_event(self, event_name: str, event_params: Dict = None) -> bool:
+        """
+        Send event to GA4 via Measurement Protocol.
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        payload = self._build_event_payload(event_name, event_params)
         
         try:
-            response = requests.post(
-                endpoint,
-                params={
-                    "measurement_id": self.measurement_id,
-                    "api_secret": self.api_secret
-                },
-                json=payload,
+            response = self._session.post(
+                self._endpoint_url,
+                data=_dumps(payload),
                 timeout=10
             )
-            
-            if self.debug:
-                # Debug endpoint returns validation messages
-                debug_response = response.json()
-                if debug_response.get('validationMessages'):
-                    logger.warning(f"GA4 validation messages: {debug_response['validationMessages']}")
-                else:
-                    logger.debug("GA4 event validated successfully")
-            
-            if response.status_code == 204 or response.status_code == 200:
-                logger.debug(f"Sent GA4 event: {event_name}")
-                return True
-            else:
-                logger.error(f"GA4 event failed: {response.status_code} - {response.text}")
-                return False
+            return self._handle_event_response(event_name, response)
                 
         except Exception as e:
             logger.error(f"Error sending GA4 event: {e}")
             return False
     
+    async def _send_event_async(self, event_name: str, event_params: Dict = None) -> bool:
+        """
+        Async variant of _send_event for use from scraper coroutines.
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        if not HTTPX_AVAILABLE:
+            # No async client available; don't block the event loop
+            return await asyncio.to_thread(self._post_event, event_name, event_params)
+        
+        if self._aio_client is None:
+            self._aio_client = httpx.AsyncClient(timeout=10, headers=JSON_HEADERS)
+        
+        payload = self._build_event_payload(event_name, event_params)
+        
+        try:
+            response = await self._aio_client.post(
+                self._endpoint_url,
+                content=_dumps(payload)
+            )
+            return self._handle_event_response(event_name, response)
+            
+        except Exception as e:
+            logger.error(f"Error sending GA4 event: {e}")
+            return False
+    
+    def send_event_nowait(self, event_name: str, event_params: Dict = None) -> "asyncio.Task":
+        """
+        Schedule an event on the running loop without waiting for it.
+        
+        Must be called from within a coroutine; use aclose() to wait for
+        outstanding sends before the loop exits.
+        """
+        task = asyncio.get_running_loop().create_task(self._send_event_async(event_name, event_params))
+        # Hold a reference so the task isn't garbage-collected mid-flight
+        self._pending_tasks.add(task)
+        task.add_done_callback(self._pending_tasks.discard)
+        return task
+    
     def track_scraper_run(self, source: str, products_scraped: int = 0, 
                          errors: int = 0, duration_seconds: float = 0,
                          status: str = 'success', **kwargs) -> bool:
@@ -171,17 +328,33 @@ class AnalyticsTracker:
         Returns:
             True if event sent successfully
         """
-        event_params = {
+        event_params = self._scraper_run_params(
+            source, products_scraped, errors, duration_seconds, status, **kwargs
+        )
+        
+        return self._send_event("scraper_run", event_params)
+    
+    async def track_scraper_run_async(self, source: str, products_scraped: int = 0,
+                                      errors: int = 0, duration_seconds: float = 0,
+                                      status: str = 'success', **kwargs) -> bool:
+        """Async variant of track_scraper_run (same arguments)."""
+        event_params = self._scraper_run_params(
+            source, products_scraped, errors, duration_seconds, status, **kwargs
+        )
+        
+        return await self._send_event_async("scraper_run", event_params)
+    
+    def _scraper_run_params(self, source: str, products_scraped: int, errors: int,
+                            duration_seconds: float, status: str, **kwargs) -> Dict[str, Any]:
+        """Event parameters shared by the sync and async scraper_run trackers."""
+        return {
             "source": source,
             "products_scraped": products_scraped,
             "errors": errors,
             "duration_seconds": round(duration_seconds, 2),
             "status": status,
-            "timestamp": datetime.now().isoformat(),
             **kwargs
         }
-        
-        return self._send_event("scraper_run", event_params)
     
     def track_scraper_error(self, source: str, error_type: str, 
                            error_message: str = None, **kwargs) -> bool:
@@ -201,7 +374,6 @@ class AnalyticsTracker:
             "source": source,
             "error_type": error_type,
             "error_message": (error_message or '')[:100],  # Truncate for GA4 limits
-            "timestamp": datetime.now().isoformat(),
             **kwargs
         }
         
@@ -227,7 +399,6 @@ class AnalyticsTracker:
             "product_title": (product_title or '')[:100],
             "brand": brand,
             "price": price,
-            "timestamp": datetime.now().isoformat(),
             **kwargs
         }
         
@@ -248,7 +419,6 @@ class AnalyticsTracker:
         event_params = {
             "source": source,
             "url": url[:200],  # Truncate long URLs
-            "timestamp": datetime.now().isoformat(),
             **kwargs
         }
         
@@ -269,45 +439,44 @@ class AnalyticsTracker:
     
     def send_batch_events(self, events: List[Dict[str, Any]]) -> bool:
         """
-        Send multiple events in one request (up to 25 events per batch).
+        Send multiple events, 25 per request (GA4's per-batch maximum).
         
         Args:
             events: List of event dictionaries with 'name' and 'params' keys
             
         Returns:
-            True if batch sent successfully
+            True if every batch sent successfully
         """
-        if len(events) > 25:
-            logger.warning("GA4 allows max 25 events per batch, truncating")
-            events = events[:25]
-        
-        endpoint = self.GA4_DEBUG_ENDPOINT if self.debug else self.GA4_ENDPOINT
-        
+        # Chunk rather than truncate so large batches aren't silently dropped
+        results = [
+            self._post_batch(events[i:i + self.BATCH_SIZE])
+            for i in range(0, len(events), self.BATCH_SIZE)
+        ]
+        return all(results)
+    
+    def _post_batch(self, events: List[Dict[str, Any]]) -> bool:
+        """Send up to 25 events in one Measurement Protocol request."""
         # Build batch payload
         formatted_events = []
         for event in events:
-            formatted_events.append({
+            formatted_event = {
                 "name": event.get('name', 'custom_event'),
                 "params": {
                     "session_id": self.session_id,
                     "engagement_time_msec": "100",
                     **(event.get('params', {}))
                 }
-            })
+            }
+            if 'timestamp_micros' in event:
+                formatted_event["timestamp_micros"] = event['timestamp_micros']
+            formatted_events.append(formatted_event)
         
-        payload = {
-            "client_id": self.client_id,
-            "events": formatted_events
-        }
+        payload = {**self._payload_skeleton, "events": formatted_events}
         
         try:
-            response = requests.post(
-                endpoint,
-                params={
-                    "measurement_id": self.measurement_id,
-                    "api_secret": self.api_secret
-                },
-                json=payload,
+            response = self._session.post(
+                self._endpoint_url,
+                data=_dumps(payload),
                 timeout=10
             )
             
@@ -321,6 +490,46 @@ class AnalyticsTracker:
         except Exception as e:
             logger.error(f"Error sending GA4 batch: {e}")
             return False
+    
+    def _drain(self):
+        """Background loop: send queued events in batches."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.BATCH_WAIT_SECONDS
+            while len(batch) < self.BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            try:
+                self._post_batch(batch)
+            except Exception as e:
+                # Keep the drain thread alive whatever happens to one batch
+                logger.error(f"Error sending GA4 batch: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    def flush(self):
+        """Block until every queued event has been sent."""
+        self._queue.join()
+    
+    def close(self):
+        """Send queued events, then close the underlying HTTP session."""
+        self.flush()
+        self._session.close()
+    
+    async def aclose(self):
+        """Wait for pending async sends, then close the async client."""
+        if self._pending_tasks:
+            await asyncio.gather(*self._pending_tasks, return_exceptions=True)
+        if self._aio_client is not None:
+            await self._aio_client.aclose()
+            self._aio_client = None
 
 
 class ScraperRunContext:
@@ -341,6 +550,7 @@ class ScraperRunContext:
         self.start_time = None
         self.products_scraped = 0
         self.errors = 0
+        self.latencies: List[float] = []
     
     def __enter__(self):
         """Start tracking run."""
@@ -358,8 +568,11 @@ class ScraperRunContext:
             errors=self.errors,
             duration_seconds=duration,
             status=status,
+            **self._latency_params(),
             **self.extra_params
         )
+        # Make sure the run's events are out before the caller moves on
+        self.tracker.flush()
         
         return False  # Don't suppress exceptions
     
@@ -370,6 +583,21 @@ class ScraperRunContext:
     def increment_errors(self, count: int = 1):
         """Increment errors counter."""
         self.errors += count
+    
+    def record_latency(self, seconds: float):
+        """Record how long one product took to scrape."""
+        self.latencies.append(seconds)
+    
+    def _latency_params(self) -> Dict[str, Any]:
+        """Per-product latency statistics for the run event (empty if none recorded)."""
+        if not self.latencies or not NUMPY_AVAILABLE:
+            return {}
+        mean, std, p95 = _latency_stats(np.asarray(self.latencies, dtype=np.float64))
+        return {
+            "latency_mean_seconds": round(float(mean), 3),
+            "latency_std_seconds": round(float(std), 3),
+            "latency_p95_seconds": round(float(p95), 3),
+        }
 
 
 if __name__ == '__main__':
@@ -428,6 +656,8 @@ if __name__ == '__main__':
     with ScraperRunContext(tracker, 'example_scraper', collection='nike') as ctx:
         # Simulate scraping
         for i in range(5):
-            ctx.increment_products()
+            started = time.perf_counter()
             time.sleep(0.1)
+            ctx.increment_products()
+            ctx.record_latency(time.perf_counter() - started)
         print("Scraping complete - event will be sent on exit")
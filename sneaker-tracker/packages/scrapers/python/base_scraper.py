@@ -4,12 +4,19 @@ Provides foundation for all Playwright-Python scrapers
 """
 
 import asyncio
+import hashlib
 import os
-from typing import List, Dict, Optional, Any
+import random
+import re
+import shelve
+from typing import Callable, List, Dict, Optional, Any
 from datetime import datetime
 from abc import ABC, abstractmethod
+from functools import lru_cache
 
-from playwright.async_api import async_playwright, Browser, Page, BrowserContext
+import aiohttp
+import orjson
+from playwright.async_api import async_playwright, Browser, Page, BrowserContext, Playwright, TimeoutError as PlaywrightTimeoutError
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from fake_useragent import UserAgent
@@ -24,6 +31,64 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+# Everything in a price string except digits, the decimal point and sign
+_PRICE_STRIP = re.compile(r'[^\d.\-]')
+
+def _release_digest(row: Dict[str, Any]) -> bytes:
+    """Content hash of a normalized release, ignoring when it was scraped"""
+    content = {k: v for k, v in row.items() if k != "scraped_at"}
+    return hashlib.blake2b(orjson.dumps(content, option=orjson.OPT_SORT_KEYS), digest_size=16).digest()
+
+
+@lru_cache(maxsize=1)
+def _get_user_agent() -> UserAgent:
+    """Shared UserAgent; its bundled UA data is loaded once per process"""
+    return UserAgent()
+
+
+# One Playwright driver + Chromium per process, shared by every run()
+_playwright: Optional[Playwright] = None
+_browser: Optional[Browser] = None
+_browser_lock: Optional[asyncio.Lock] = None
+_browser_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def get_browser(scraper: "BaseSneakerScraper") -> Browser:
+    """
+    Return the shared browser, launching it on first use.
+    
+    The first caller's launch settings (headless, proxy) apply to every
+    scraper sharing it. Call close_browser() once scraping is done.
+    """
+    global _playwright, _browser, _browser_lock, _browser_loop
+    
+    loop = asyncio.get_running_loop()
+    if _browser_loop is not loop:
+        # Playwright objects are bound to the loop that created them
+        _playwright = _browser = None
+        _browser_lock = asyncio.Lock()
+        _browser_loop = loop
+    
+    async with _browser_lock:
+        if _browser is None or not _browser.is_connected():
+            if _playwright is None:
+                _playwright = await async_playwright().start()
+            _browser = await scraper.launch_chromium(_playwright)
+    
+    return _browser
+
+
+async def close_browser():
+    """Close the shared browser and stop Playwright"""
+    global _playwright, _browser
+    
+    if _browser is not None:
+        await _browser.close()
+    if _playwright is not None:
+        await _playwright.stop()
+    _playwright = _browser = None
+
+
 class BaseSneakerScraper(ABC):
     """
     Abstract base class for all sneaker scrapers
@@ -36,6 +101,25 @@ class BaseSneakerScraper(ABC):
     - Anti-detection measures
     """
     
+    # Supabase upserts are sent in chunks, a few at a time
+    UPSERT_CHUNK_SIZE = 200
+    UPSERT_CONCURRENCY = 3
+    
+    # Navigations fail fast rather than waiting on slow third-party assets
+    NAVIGATION_TIMEOUT_MS = 8000
+    
+    # Per-scraper shelve of release content digests from earlier runs, used
+    # to skip upserting unchanged rows; None disables it
+    RELEASE_CACHE_DIR: Optional[str] = os.path.join(os.path.expanduser("~"), ".cache", "sneaker_tracker")
+    
+    # Resource types aborted in every context; scrapers read image URLs
+    # from attributes/JSON, never rendered pixels. Override to allow them.
+    BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+    
+    # Selector that marks the landing page as ready to scrape; None skips
+    # the wait (e.g. scrapers that only call JSON APIs)
+    ready_selector: Optional[str] = None
+    
     def __init__(
         self,
         scraper_name: str,
@@ -54,8 +138,8 @@ class BaseSneakerScraper(ABC):
         # Supabase client
         self.supabase: Optional[Client] = self._init_supabase()
         
-        # User agent rotation
-        self.ua = UserAgent()
+        # Plain HTTP client for JSON endpoints (created lazily in the running loop)
+        self._http: Optional[aiohttp.ClientSession] = None
         
         # Scraping stats
         self.stats = {
@@ -65,6 +149,26 @@ class BaseSneakerScraper(ABC):
             "errors": 0
         }
     
+    @property
+    def ua(self) -> UserAgent:
+        """User agent rotation (one UserAgent per process, loaded on first use)"""
+        return _get_user_agent()
+    
+    @property
+    def http(self) -> aiohttp.ClientSession:
+        """Shared aiohttp session for endpoints that don't need a browser"""
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+        return self._http
+    
+    async def close_http(self):
+        """Close the aiohttp session if one was opened"""
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
+    
     def _init_supabase(self) -> Optional[Client]:
         """Initialize Supabase client"""
         url = os.getenv("SUPABASE_URL")
@@ -83,9 +187,13 @@ class BaseSneakerScraper(ABC):
             return None
     
     async def launch_browser(self) -> tuple[Browser, BrowserContext]:
-        """Launch Playwright browser with anti-detection measures"""
-        playwright = await async_playwright().start()
-        
+        """Get the shared browser and open a context with anti-detection measures"""
+        browser = await get_browser(self)
+        context = await self.new_context(browser)
+        return browser, context
+    
+    async def launch_chromium(self, playwright: Playwright) -> Browser:
+        """Launch a Chromium instance (shareable across scrapers via run_with_browser)"""
         browser_args = [
             '--no-sandbox',
             '--disable-blink-features=AutomationControlled',
@@ -109,6 +217,11 @@ class BaseSneakerScraper(ABC):
             proxy=proxy_config
         )
         
+        self.logger.info(f"Browser launched (headless={self.headless})")
+        return browser
+    
+    async def new_context(self, browser: Browser) -> BrowserContext:
+        """Create an isolated browser context with anti-detection measures"""
         context = await browser.new_context(
             user_agent=self.ua.random,
             viewport={"width": 1920, "height": 1080},
@@ -124,8 +237,19 @@ class BaseSneakerScraper(ABC):
             Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']});
         """)
         
-        self.logger.info(f"Browser launched (headless={self.headless})")
-        return browser, context
+        # Skip heavy assets to cut bandwidth and render time per navigation
+        if self.BLOCKED_RESOURCE_TYPES:
+            blocked = self.BLOCKED_RESOURCE_TYPES
+            
+            async def block_assets(route):
+                if route.request.resource_type in blocked:
+                    await route.abort()
+                else:
+                    await route.continue_()
+            
+            await context.route("**/*", block_assets)
+        
+        return context
     
     async def create_page(self, context: BrowserContext) -> Page:
         """Create a new page with standard configuration"""
@@ -188,8 +312,8 @@ class BaseSneakerScraper(ABC):
         if isinstance(price_str, (int, float)):
             return float(price_str)
         
-        # Remove currency symbols and whitespace
-        cleaned = str(price_str).replace('$', '').replace(',', '').replace('€', '').replace('£', '').strip()
+        # Remove currency symbols, separators and whitespace in one pass
+        cleaned = _PRICE_STRIP.sub('', str(price_str))
         
         try:
             return float(cleaned)
@@ -211,47 +335,134 @@ class BaseSneakerScraper(ABC):
             self.logger.info("No releases to insert")
             return 0
         
-        # Normalize all releases
-        normalized = [self.normalize_release(r) for r in releases]
+        # Overlapping sources (e.g. Shopify collections) repeat products;
+        # keep the last copy per conflict key and normalize only those
+        unique = {
+            ((r.get("shoe_name") or "").strip(), r.get("style_code")): r
+            for r in releases
+        }
+        normalized = [self.normalize_release(r) for r in unique.values()]
         
-        try:
-            # Upsert with conflict resolution on (shoe_name, style_code)
-            response = self.supabase.table(self.supabase_table).upsert(
-                normalized,
-                on_conflict="shoe_name,style_code"
-            ).execute()
+        if not self.RELEASE_CACHE_DIR:
+            return await self._upsert_releases(normalized)
+        
+        # Only ship rows whose content changed since they were last upserted
+        os.makedirs(self.RELEASE_CACHE_DIR, exist_ok=True)
+        cache_path = os.path.join(self.RELEASE_CACHE_DIR, self.scraper_name)
+        
+        with shelve.open(cache_path) as cache:
+            digests = {}
+            changed = []
+            for row in normalized:
+                key = f"{row['shoe_name']}\x1f{row.get('style_code')}"
+                digest = _release_digest(row)
+                if cache.get(key) != digest:
+                    digests[id(row)] = (key, digest)
+                    changed.append(row)
             
-            count = len(response.data) if response.data else 0
-            self.logger.info(f"Inserted/updated {count} records to Supabase")
-            return count
+            skipped = len(normalized) - len(changed)
+            if skipped:
+                self.logger.info(f"Skipping {skipped} unchanged releases")
             
-        except Exception as e:
-            self.logger.error(f"Supabase insert failed: {e}")
-            self.stats["errors"] += 1
+            def remember(chunk: List[Dict[str, Any]]):
+                for row in chunk:
+                    key, digest = digests[id(row)]
+                    cache[key] = digest
+            
+            return await self._upsert_releases(changed, on_success=remember)
+    
+    async def _upsert_releases(
+        self,
+        normalized: List[Dict[str, Any]],
+        on_success: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+    ) -> int:
+        """Upsert normalized releases in chunks; on_success gets each chunk that landed"""
+        if not normalized:
+            self.logger.info("No changed releases to insert")
             return 0
+        
+        # The supabase client is blocking, so each chunk is upserted on a
+        # worker thread; a few run at once while the event loop stays free
+        sem = asyncio.Semaphore(self.UPSERT_CONCURRENCY)
+        
+        async def upsert_chunk(chunk: List[Dict[str, Any]]) -> int:
+            async with sem:
+                try:
+                    # Upsert with conflict resolution on (shoe_name, style_code)
+                    response = await asyncio.to_thread(
+                        self.supabase.table(self.supabase_table).upsert(
+                            chunk,
+                            on_conflict="shoe_name,style_code"
+                        ).execute
+                    )
+                    
+                except Exception as e:
+                    self.logger.error(f"Supabase insert failed ({len(chunk)} records): {e}")
+                    self.stats["errors"] += 1
+                    return 0
+                
+                if on_success:
+                    on_success(chunk)
+                return len(response.data) if response.data else 0
+        
+        size = self.UPSERT_CHUNK_SIZE
+        counts = await asyncio.gather(*(
+            upsert_chunk(normalized[i:i + size])
+            for i in range(0, len(normalized), size)
+        ))
+        
+        count = sum(counts)
+        self.logger.info(f"Inserted/updated {count} records to Supabase")
+        return count
     
     async def run(self) -> Dict[str, Any]:
         """
         Main execution method
         
+        Returns:
+            Stats dictionary with execution metrics
+        """
+        try:
+            # Reused across runs; only the context and page are per-run
+            browser = await get_browser(self)
+        except Exception as e:
+            self.logger.error(f"Scraper failed: {e}", exc_info=True)
+            self.stats["errors"] += 1
+            self.stats["completed_at"] = datetime.utcnow().isoformat()
+            return self.stats
+        
+        return await self.run_with_browser(browser)
+    
+    async def run_with_browser(self, browser: Browser) -> Dict[str, Any]:
+        """
+        Run the scraper in a new context on an already-launched browser.
+        
+        Lets several scrapers share one Chromium process; the browser is
+        left open for the caller to close.
+        
         Returns:
             Stats dictionary with execution metrics
         """
         self.logger.info(f"Starting scraper: {self.scraper_name}")
         
-        browser = None
         context = None
         
         try:
-            browser, context = await self.launch_browser()
+            context = await self.new_context(browser)
             page = await self.create_page(context)
+            page.set_default_navigation_timeout(self.NAVIGATION_TIMEOUT_MS)
             
             # Navigate to base URL
             self.logger.info(f"Navigating to {self.base_url}")
-            await page.goto(self.base_url, wait_until="domcontentloaded", timeout=30000)
+            await page.goto(self.base_url, wait_until="domcontentloaded")
             
-            # Wait for network idle
-            await page.wait_for_load_state("networkidle", timeout=10000)
+            # Wait for the content we need rather than for the network to go
+            # idle, which ads and tracking pixels can hold off indefinitely
+            if self.ready_selector:
+                try:
+                    await page.wait_for_selector(self.ready_selector, timeout=5000)
+                except PlaywrightTimeoutError:
+                    self.logger.warning(f"Ready selector {self.ready_selector!r} not found; scraping anyway")
             
             # Execute scraping logic
             releases = await self.scrape_releases(page)
@@ -268,8 +479,7 @@ class BaseSneakerScraper(ABC):
         finally:
             if context:
                 await context.close()
-            if browser:
-                await browser.close()
+            await self.close_http()
             
             self.stats["completed_at"] = datetime.utcnow().isoformat()
             self.logger.info(f"Scraper completed: {self.stats}")
@@ -278,11 +488,53 @@ class BaseSneakerScraper(ABC):
     
     async def wait_random(self, min_ms: int = 500, max_ms: int = 2000):
         """Random wait to avoid detection"""
-        import random
-        delay = random.randint(min_ms, max_ms) / 1000
+        delay = (min_ms + random.random() * (max_ms - min_ms)) / 1000.0
         await asyncio.sleep(delay)
 
 
+def _keyword_re(keywords: List[str]) -> re.Pattern:
+    """Case-insensitive substring match for any of the keywords"""
+    return re.compile("|".join(map(re.escape, keywords)), re.IGNORECASE)
+
+
+def _brand_re(brands) -> re.Pattern:
+    """
+    One case-insensitive regex that picks the first brand, in order, with a
+    keyword anywhere in the text: the matching group is b<index>.
+    
+    Each alternative is a lookahead over the whole string, so brand priority
+    is kept (a leftmost-match alternation would prefer whichever keyword
+    appears first in the text).
+    """
+    alternatives = "|".join(
+        f"(?=.*?(?:{'|'.join(map(re.escape, keywords))}))(?P<b{i}>)"
+        for i, (_, keywords) in enumerate(brands)
+    )
+    return re.compile(f"^(?:{alternatives})", re.IGNORECASE | re.DOTALL)
+
+
+# Product title/type/vendor keywords that mark a sneaker
+_SNEAKER_RE = _keyword_re(["sneaker", "shoe", "trainer", "runner", "boot", "jordan", "nike", "adidas", "yeezy", "new balance", "asics"])
+
+# Stand-in for a missing/empty Shopify variants or images list
+_NO_ITEMS = ({},)
+
+# Checked in order; the first brand whose keywords match wins
+_BRAND_RES = {
+    brand: _keyword_re(keywords)
+    for brand, keywords in {
+        "Nike": ["nike", "air jordan", "jordan"],
+        "Adidas": ["adidas", "yeezy"],
+        "New Balance": ["new balance"],
+        "ASICS": ["asics"],
+        "Reebok": ["reebok"],
+        "Puma": ["puma"],
+        "Vans": ["vans"],
+        "Converse": ["converse"]
+    }.items()
+}
+
+
 # Example implementation
 class ShopifyScraper(BaseSneakerScraper):
     """
@@ -298,64 +550,59 @@ class ShopifyScraper(BaseSneakerScraper):
     
     async def scrape_releases(self, page: Page) -> List[Dict[str, Any]]:
         """Scrape releases using Shopify's products.json API"""
+        # products.json is plain JSON, so it's fetched over HTTP rather than
+        # through the browser; collections are fetched in parallel
+        results = await asyncio.gather(
+            *(self._fetch_collection(collection) for collection in self.collections)
+        )
+        return [release for batch in results for release in batch]
+    
+    async def _fetch_collection(self, collection: str) -> List[Dict[str, Any]]:
+        """Fetch one collection's products.json and keep the sneakers"""
         releases = []
         
-        for collection in self.collections:
-            try:
-                api_url = f"{self.base_url}/collections/{collection}/products.json?limit=250"
-                self.logger.info(f"Fetching {api_url}")
-                
-                response = await page.goto(api_url, wait_until="domcontentloaded")
-                
-                if response.ok:
-                    data = await response.json()
-                    
-                    if "products" in data:
-                        for product in data["products"]:
-                            # Filter for sneakers
-                            if self._is_sneaker(product):
-                                release = {
-                                    "shoe_name": product["title"],
-                                    "style_code": product.get("variants", [{}])[0].get("sku") or str(product["id"]),
-                                    "retail_price": product.get("variants", [{}])[0].get("price"),
-                                    "image_url": product.get("images", [{}])[0].get("src"),
-                                    "product_url": f"{self.base_url}/products/{product['handle']}",
-                                    "brand": self._detect_brand(product["title"], product.get("vendor")),
-                                    "status": "available" if any(v.get("available") for v in product.get("variants", [])) else "sold_out",
-                                    "scraped_url": api_url
-                                }
-                                releases.append(release)
-                
-                await self.wait_random(1000, 3000)
-                
-            except Exception as e:
-                self.logger.error(f"Collection {collection} failed: {e}")
+        try:
+            api_url = f"{self.base_url}/collections/{collection}/products.json?limit=250"
+            self.logger.info(f"Fetching {api_url}")
+            
+            async with self.http.get(api_url, headers={"User-Agent": self.ua.random}) as response:
+                data = orjson.loads(await response.read()) if response.ok else None
+            
+            if data and "products" in data:
+                for product in data["products"]:
+                    # Filter for sneakers
+                    if self._is_sneaker(product):
+                        # Shared empty fallbacks instead of a fresh [{}] per lookup
+                        variants = product.get("variants") or _NO_ITEMS
+                        first_variant = variants[0]
+                        release = {
+                            "shoe_name": product["title"],
+                            "style_code": first_variant.get("sku") or str(product["id"]),
+                            "retail_price": first_variant.get("price"),
+                            "image_url": (product.get("images") or _NO_ITEMS)[0].get("src"),
+                            "product_url": f"{self.base_url}/products/{product['handle']}",
+                            "brand": self._detect_brand(product["title"], product.get("vendor")),
+                            "status": "available" if any(v.get("available") for v in variants) else "sold_out",
+                            "scraped_url": api_url
+                        }
+                        releases.append(release)
+            
+        except Exception as e:
+            self.logger.error(f"Collection {collection} failed: {e}")
         
         return releases
     
     def _is_sneaker(self, product: Dict) -> bool:
         """Check if product is a sneaker"""
-        text = f"{product.get('title', '')} {product.get('product_type', '')} {product.get('vendor', '')}".lower()
-        keywords = ["sneaker", "shoe", "trainer", "runner", "boot", "jordan", "nike", "adidas", "yeezy", "new balance", "asics"]
-        return any(kw in text for kw in keywords)
+        text = f"{product.get('title', '')} {product.get('product_type', '')} {product.get('vendor', '')}"
+        return _SNEAKER_RE.search(text) is not None
     
     def _detect_brand(self, title: str, vendor: str = None) -> str:
         """Detect brand from title/vendor"""
-        text = f"{title} {vendor or ''}".lower()
-        
-        brands = {
-            "Nike": ["nike", "air jordan", "jordan"],
-            "Adidas": ["adidas", "yeezy"],
-            "New Balance": ["new balance"],
-            "ASICS": ["asics"],
-            "Reebok": ["reebok"],
-            "Puma": ["puma"],
-            "Vans": ["vans"],
-            "Converse": ["converse"]
-        }
+        text = f"{title} {vendor or ''}"
         
-        for brand, keywords in brands.items():
-            if any(kw in text for kw in keywords):
+        for brand, pattern in _BRAND_RES.items():
+            if pattern.search(text):
                 return brand
         
         return vendor or "Unknown"
@@ -375,7 +622,10 @@ async def main():
     store_url = sys.argv[2] if len(sys.argv) > 2 else f"https://{store_name}.com"
     
     scraper = ShopifyScraper(store_name, store_url)
-    stats = await scraper.run()
+    try:
+        stats = await scraper.run()
+    finally:
+        await close_browser()
     
     print(f"\n✅ Scraping Complete!")
     print(f"Releases Found: {stats['releases_found']}")
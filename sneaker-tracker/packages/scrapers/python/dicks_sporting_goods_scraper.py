@@ -16,16 +16,32 @@ Usage:
 """
 
 import os
+import re
 import sys
-import json
+import asyncio
 import logging
 import argparse
 from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 
-import requests
-from bs4 import BeautifulSoup
+import httpx
+import orjson
 from dotenv import load_dotenv
+from lxml import etree, html as lxml_html
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# selectolax's lexbor backend parses large product grids several times
+# faster than lxml; lxml remains the fallback
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
 
 load_dotenv()
 
@@ -36,19 +52,76 @@ logging.basicConfig(
 logger = logging.getLogger('dicks_scraper')
 
 
+# Card names that look like sneakers (case-insensitive substring match)
+_SNEAKER_KW_RE = re.compile(r'nike|jordan|adidas|shoe|sneaker', re.IGNORECASE)
+
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching one class token (like BeautifulSoup's class_)."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _first_all(node, xpaths) -> list:
+    """All elements matched by the first XPath that finds anything."""
+    for xpath in xpaths:
+        found = xpath(node)
+        if found:
+            return found
+    return []
+
+
+def _first(node, xpaths):
+    """First element matched by the first XPath that finds anything."""
+    found = _first_all(node, xpaths)
+    return found[0] if found else None
+
+
+def _css_first(node, selectors):
+    """First selectolax node matched by the first selector that finds anything."""
+    for selector in selectors:
+        found = node.css_first(selector)
+        if found is not None:
+            return found
+    return None
+
+
 class DicksSportingGoodsScraper:
     """Scraper for Dick's Sporting Goods sneaker releases."""
     
+    # Compiled once and reused for every HTML response; each tuple is
+    # tried in order and the first XPath with a match wins
+    _CARD_XPATHS = (
+        etree.XPath(f"//div[{_has_class('product-card')}]"),
+        etree.XPath(f"//article[{_has_class('product')}]"),
+        etree.XPath(f"//li[{_has_class('product-item')}]"),
+        etree.XPath("//div[@data-product-id]"),
+    )
+    _NAME_XPATHS = (
+        etree.XPath(".//h3"),
+        etree.XPath(f".//*[{_has_class('product-name')}]"),
+        etree.XPath(f".//*[{_has_class('product-title')}]"),
+    )
+    _PRICE_XPATHS = (
+        etree.XPath(f".//*[{_has_class('price')}]"),
+        etree.XPath(f".//*[{_has_class('product-price')}]"),
+    )
+    _IMG_XPATHS = (etree.XPath(".//img"),)
+    _LINK_XPATHS = (etree.XPath(".//a"),)
+    
+    # The same lookups as CSS selectors for the selectolax parser
+    _CARD_CSS = ('div.product-card', 'article.product', 'li.product-item', 'div[data-product-id]')
+    _NAME_CSS = ('h3', '.product-name', '.product-title')
+    _PRICE_CSS = ('.price', '.product-price')
+    
     def __init__(self):
         self.base_url = 'https://www.dickssportinggoods.com'
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept': 'application/json, text/html',
             'Accept-Language': 'en-US,en;q=0.9'
-        })
+        }
     
-    def scrape_releases(self, brand: str = None, limit: int = 50) -> List[Dict]:
+    async def scrape_releases(self, brand: str = None, limit: int = 50) -> List[Dict]:
         """
         Scrape sneaker releases.
         
@@ -59,9 +132,20 @@ class DicksSportingGoodsScraper:
         Returns:
             List of release dictionaries
         """
+        return [release async for release in self.iter_releases(brand=brand, limit=limit)]
+    
+    async def iter_releases(self, brand: str = None, limit: int = 50) -> AsyncIterator[Dict]:
+        """
+        Yield sneaker releases one at a time (see scrape_releases).
+        
+        Lets callers write results out as they go instead of holding the
+        full list.
+        """
         logger.info(f"Scraping Dick's releases (brand={brand}, limit={limit})")
         
         releases = []
+        # One timestamp for every product from this scrape
+        scraped_at = datetime.now(timezone.utc).isoformat()
         
         # Try search/catalog endpoints
         endpoints = [
@@ -71,121 +155,195 @@ class DicksSportingGoodsScraper:
             '/c/athletic-shoes'
         ]
         
-        for endpoint in endpoints:
-            url = self.base_url + endpoint
+        # All endpoints are requested concurrently over one pooled client;
+        # the first to return products wins and the rest are cancelled
+        async with httpx.AsyncClient(
+            headers=self.headers,
+            http2=HTTP2_AVAILABLE,
+            timeout=30,
+            limits=httpx.Limits(max_connections=16)
+        ) as client:
+            tasks = {
+                asyncio.create_task(self._fetch_endpoint(client, endpoint, scraped_at)): endpoint
+                for endpoint in endpoints
+            }
+            pending = set(tasks)
             
             try:
-                response = self.session.get(url, timeout=30)
-                
-                if response.status_code == 200:
-                    # Try JSON first
-                    if 'application/json' in response.headers.get('Content-Type', ''):
-                        data = response.json()
-                        products = self._parse_json_products(data)
-                        releases.extend(products)
-                    else:
-                        # Parse HTML
-                        soup = BeautifulSoup(response.content, 'html.parser')
-                        products = self._parse_html_products(soup)
-                        releases.extend(products)
-                    
-                    if releases:
-                        logger.info(f"Found {len(releases)} releases from {endpoint}")
-                        break
-                        
-            except Exception as e:
-                logger.warning(f"Endpoint {endpoint} failed: {e}")
+                while pending and not releases:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.result():
+                            releases = task.result()
+                            logger.info(f"Found {len(releases)} releases from {tasks[task]}")
+                            break
+            finally:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        # Apply brand filter and limit
+        brand_lower = brand.lower() if brand else None
+        count = 0
+        for release in releases:
+            if count >= limit:
+                break
+            if brand_lower and brand_lower not in release.get('name', '').lower():
                 continue
+            yield release
+            count += 1
         
-        # Apply brand filter
-        if brand:
-            releases = [r for r in releases if brand.lower() in r.get('name', '').lower()]
+        logger.info(f"Scraped {count} releases from Dick's")
+    
+    async def _fetch_endpoint(self, client: httpx.AsyncClient, endpoint: str, scraped_at: str) -> List[Dict]:
+        """Fetch one endpoint and parse its products (empty list on failure)."""
+        url = self.base_url + endpoint
+        
+        try:
+            response = await client.get(url)
+            
+            if response.status_code == 200:
+                # Try JSON first
+                if 'application/json' in response.headers.get('Content-Type', ''):
+                    data = orjson.loads(response.content)
+                    return self._parse_json_products(data, scraped_at)
+                else:
+                    # Parse HTML
+                    return self._parse_html_products(response.content, scraped_at)
+                    
+        except Exception as e:
+            logger.warning(f"Endpoint {endpoint} failed: {e}")
         
-        logger.info(f"Scraped {len(releases)} releases from Dick's")
-        return releases[:limit]
+        return []
     
-    def _parse_json_products(self, data: Dict) -> List[Dict]:
+    def _parse_json_products(self, data: Dict, scraped_at: str) -> List[Dict]:
         """Parse JSON product data."""
         products = []
         
         # Dick's API structure (adjust based on actual response)
         items = data.get('products', data.get('items', data.get('results', [])))
         
+        # Attributes and methods used on every item, bound once as locals
+        append = products.append
+        base = self.base_url
+        build = self._build_product_url
+        log_error = logger.error
+        
         for item in items:
             try:
-                product = {
-                    'name': item.get('name', item.get('title', 'Unknown')),
-                    'sku': item.get('sku', item.get('productId')),
-                    'price': item.get('price', {}).get('current') or item.get('salePrice'),
-                    'retail_price': item.get('price', {}).get('regular') or item.get('listPrice'),
-                    'brand': item.get('brand'),
-                    'image_url': item.get('imageUrl', item.get('thumbnail')),
-                    'product_url': self._build_product_url(item.get('url') or item.get('productId')),
-                    'availability': item.get('availability', 'unknown'),
+                get = item.get
+                price_info = get('price', {})
+                append({
+                    'name': get('name', get('title', 'Unknown')),
+                    'sku': get('sku', get('productId')),
+                    'price': price_info.get('current') or get('salePrice'),
+                    'retail_price': price_info.get('regular') or get('listPrice'),
+                    'brand': get('brand'),
+                    'image_url': get('imageUrl', get('thumbnail')),
+                    'product_url': build(get('url') or get('productId')),
+                    'availability': get('availability', 'unknown'),
                     'retailer': "Dick's Sporting Goods",
-                    'source': self.base_url,
-                    'scraped_at': datetime.now(timezone.utc).isoformat()
-                }
-                
-                products.append(product)
+                    'source': base,
+                    'scraped_at': scraped_at
+                })
             except Exception as e:
-                logger.error(f"Error parsing JSON product: {e}")
+                log_error(f"Error parsing JSON product: {e}")
                 continue
         
         return products
     
-    def _parse_html_products(self, soup: BeautifulSoup) -> List[Dict]:
+    def _parse_html_products(self, content: bytes, scraped_at: str) -> List[Dict]:
         """Parse HTML product listings."""
         products = []
         
-        # Find product cards (adjust selectors)
-        product_cards = soup.find_all('div', class_='product-card') or \
-                       soup.find_all('article', class_='product') or \
-                       soup.find_all('li', class_='product-item') or \
-                       soup.find_all('div', {'data-product-id': True})
+        # Find product cards (adjust selectors); selectolax when installed,
+        # lxml otherwise, behind the same card/name/details accessors
+        if SELECTOLAX_AVAILABLE:
+            product_cards = self._lexbor_cards(content)
+            card_name, card_details = self._lexbor_name, self._lexbor_details
+        else:
+            product_cards = self._lxml_cards(content)
+            card_name, card_details = self._lxml_name, self._lxml_details
         
         logger.info(f"Found {len(product_cards)} product cards in HTML")
         
+        # Loop invariants bound once (see _parse_json_products)
+        append = products.append
+        base = self.base_url
+        log_error = logger.error
+        
         for card in product_cards:
             try:
-                name_elem = card.find('h3') or card.find(class_='product-name') or \
-                           card.find(class_='product-title')
-                name = name_elem.get_text(strip=True) if name_elem else 'Unknown'
+                name = card_name(card)
                 
                 # Skip if not a sneaker
-                if not any(kw in name.lower() for kw in ['nike', 'jordan', 'adidas', 'shoe', 'sneaker']):
+                if not _SNEAKER_KW_RE.search(name):
                     continue
                 
-                price_elem = card.find(class_='price') or card.find(class_='product-price')
-                price = price_elem.get_text(strip=True) if price_elem else None
-                
-                img_elem = card.find('img')
-                image_url = img_elem.get('src') or img_elem.get('data-src') if img_elem else None
-                
-                link_elem = card.find('a')
-                product_url = link_elem.get('href') if link_elem else None
+                price, image_url, product_url = card_details(card)
                 if product_url and not product_url.startswith('http'):
-                    product_url = self.base_url + product_url
+                    product_url = base + product_url
                 
-                product = {
+                append({
                     'name': name,
                     'price': price,
                     'image_url': image_url,
                     'product_url': product_url,
                     'retailer': "Dick's Sporting Goods",
-                    'source': self.base_url,
+                    'source': base,
                     'status': 'available',
-                    'scraped_at': datetime.now(timezone.utc).isoformat()
-                }
-                
-                products.append(product)
+                    'scraped_at': scraped_at
+                })
                 
             except Exception as e:
-                logger.error(f"Error parsing HTML product card: {e}")
+                log_error(f"Error parsing HTML product card: {e}")
                 continue
         
         return products
     
+    def _lexbor_cards(self, content: bytes) -> list:
+        """Product card nodes via selectolax; the first selector with matches wins."""
+        tree = LexborHTMLParser(content)
+        for selector in self._CARD_CSS:
+            cards = tree.css(selector)
+            if cards:
+                return cards
+        return []
+    
+    def _lexbor_name(self, card) -> str:
+        name_elem = _css_first(card, self._NAME_CSS)
+        return name_elem.text(strip=True) if name_elem is not None else 'Unknown'
+    
+    def _lexbor_details(self, card) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """(price text, image URL, link href) of a selectolax card."""
+        price_elem = _css_first(card, self._PRICE_CSS)
+        img_elem = card.css_first('img')
+        link_elem = card.css_first('a')
+        return (
+            price_elem.text(strip=True) if price_elem is not None else None,
+            img_elem.attributes.get('src') or img_elem.attributes.get('data-src') if img_elem is not None else None,
+            link_elem.attributes.get('href') if link_elem is not None else None,
+        )
+    
+    def _lxml_cards(self, content: bytes) -> list:
+        """Product card elements via lxml; the first XPath with matches wins."""
+        return _first_all(lxml_html.fromstring(content), self._CARD_XPATHS)
+    
+    def _lxml_name(self, card) -> str:
+        name_elem = _first(card, self._NAME_XPATHS)
+        return name_elem.text_content().strip() if name_elem is not None else 'Unknown'
+    
+    def _lxml_details(self, card) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """(price text, image URL, link href) of an lxml card."""
+        price_elem = _first(card, self._PRICE_XPATHS)
+        img_elem = _first(card, self._IMG_XPATHS)
+        link_elem = _first(card, self._LINK_XPATHS)
+        return (
+            price_elem.text_content().strip() if price_elem is not None else None,
+            img_elem.get('src') or img_elem.get('data-src') if img_elem is not None else None,
+            link_elem.get('href') if link_elem is not None else None,
+        )
+    
     def _build_product_url(self, url_or_id: str) -> str:
         """Build full product URL."""
         if not url_or_id:
@@ -197,6 +355,30 @@ class DicksSportingGoodsScraper:
         return f"{self.base_url}/p/{url_or_id}"
 
 
+async def save_releases(releases: AsyncIterator[Dict], path: str) -> Tuple[int, Optional[Dict]]:
+    """
+    Stream releases into a JSON array file, one release per line.
+    
+    Returns:
+        (number written, first release or None)
+    """
+    count = 0
+    first = None
+    
+    with open(path, 'wb') as f:
+        f.write(b'[\n')
+        async for release in releases:
+            if count:
+                f.write(b',\n')
+            else:
+                first = release
+            f.write(orjson.dumps(release))
+            count += 1
+        f.write(b'\n]\n')
+    
+    return count, first
+
+
 def main():
     """Main execution."""
     parser = argparse.ArgumentParser(description="Dick's Sporting Goods Scraper")
@@ -207,28 +389,29 @@ def main():
     args = parser.parse_args()
     
     scraper = DicksSportingGoodsScraper()
-    releases = scraper.scrape_releases(brand=args.brand, limit=args.limit)
     
-    # Save to JSON
-    with open(args.output, 'w', encoding='utf-8') as f:
-        json.dump(releases, f, indent=2, ensure_ascii=False)
+    # Save to JSON as releases arrive
+    total, sample = asyncio.run(save_releases(
+        scraper.iter_releases(brand=args.brand, limit=args.limit),
+        args.output
+    ))
     
-    logger.info(f"Saved {len(releases)} releases to {args.output}")
+    logger.info(f"Saved {total} releases to {args.output}")
     
     # Print summary
     print(f"\n{'='*60}")
     print(f"Dick's Sporting Goods Scraper - Summary")
     print(f"{'='*60}")
-    print(f"Total releases: {len(releases)}")
+    print(f"Total releases: {total}")
     if args.brand:
         print(f"Brand filter: {args.brand}")
     print(f"Output file: {args.output}")
     print(f"{'='*60}\n")
     
     # Show sample
-    if releases:
+    if sample:
         print("Sample release:")
-        print(json.dumps(releases[0], indent=2))
+        print(orjson.dumps(sample, option=orjson.OPT_INDENT_2).decode())
 
 
 if __name__ == '__main__':
@@ -18,26 +18,103 @@ Usage:
 import os
 import sys
 import json
+import hashlib
+import queue
 import logging
+import threading
 from datetime import datetime, timezone
+from functools import lru_cache
 from typing import List, Dict, Optional, Any
 from pathlib import Path
 
 try:
     import firebase_admin
     from firebase_admin import credentials, firestore
+    from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+    from google.api_core.exceptions import AlreadyExists
     FIREBASE_AVAILABLE = True
 except ImportError:
     FIREBASE_AVAILABLE = False
     logging.warning("Firebase Admin SDK not available. Install with: pip install firebase-admin")
 
+try:
+    from dateutil import parser as date_parser
+except ImportError:
+    date_parser = None
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+def _parse_dt(value: str) -> datetime:
+    """Parse a date string: fromisoformat for ISO 8601, dateutil for anything else."""
+    try:
+        # Scrapers emit isoformat() strings; 'Z' isn't accepted before 3.11
+        return datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        if date_parser is None:
+            raise
+        return date_parser.parse(value)
+
+
+# Characters replaced with '_' in URL-derived document IDs
+_ID_TRANS = str.maketrans({'?': '_', '&': '_', '=': '_', '/': '_'})
+
+# Product fields stored as Firestore timestamps when given as strings
+_DATE_FIELDS = frozenset({'release_date', 'published_date', 'scraped_at', 'created_at', 'updated_at'})
+
+
+def _coerce_date(value: str):
+    """Parse a date string, keeping the raw string if it doesn't parse"""
+    try:
+        return _parse_dt(value)
+    except (ValueError, OverflowError):
+        return value
+
+
+@lru_cache(maxsize=32)
+def _shape_preparer(keys: tuple):
+    """
+    FirestoreAdapter._prepare_product specialized for rows with exactly
+    these keys (e.g. every row of one Postgres table).
+    
+    The generated function is straight-line code: one lookup per known key
+    and the date handling decided up front, instead of looping over items()
+    and testing every key against _DATE_FIELDS.
+    """
+    lines = ['def prepare(r, now):', '    d = {}']
+    for key in keys:
+        k = repr(key)
+        lines.append(f'    v = r[{k}]')
+        if key in _DATE_FIELDS:
+            lines.append(f'    if v is not None: d[{k}] = _coerce_date(v) if isinstance(v, str) else v')
+        else:
+            lines.append(f'    if v is not None: d[{k}] = v')
+    for key in ('scraped_at', 'updated_at'):
+        if key in keys:
+            lines.append(f'    if {key!r} not in d: d[{key!r}] = now')
+        else:
+            lines.append(f'    d[{key!r}] = now')
+    lines.append('    return d')
+    
+    namespace = {'_coerce_date': _coerce_date}
+    exec('\n'.join(lines), namespace)
+    return namespace['prepare']
+
+
 class FirestoreAdapter:
     """Adapter for saving scraper data to Firestore."""
     
+    # BulkWriter ramp-up: start at 500 ops/s and grow toward Firestore's
+    # 10K writes/s ceiling
+    BULK_WRITER_OPTIONS = dict(initial_ops_per_second=500, max_ops_per_second=10000)
+    
     def __init__(self, service_account_path: str = None, service_account_json: str = None):
         """
         Initialize Firestore adapter.
@@ -74,6 +151,8 @@ class FirestoreAdapter:
             logger.info("Initialized Firebase Admin SDK")
         
         self.db = firestore.client()
+        # Collection name -> CollectionReference on self.db
+        self._col_refs = {}
         self.stats = {
             'saved': 0,
             'updated': 0,
@@ -81,6 +160,13 @@ class FirestoreAdapter:
             'skipped': 0
         }
     
+    def _collection(self, collection: str):
+        """CollectionReference for a collection name, built once per adapter."""
+        col_ref = self._col_refs.get(collection)
+        if col_ref is None:
+            col_ref = self._col_refs[collection] = self.db.collection(collection)
+        return col_ref
+    
     def _generate_doc_id(self, product: Dict) -> str:
         """
         Generate document ID from product data.
@@ -96,9 +182,8 @@ class FirestoreAdapter:
         if product.get('url'):
             # Use last part of URL as ID (cleaned)
             url = product['url']
-            doc_id = url.rstrip('/').split('/')[-1]
             # Clean ID (Firestore document IDs can't contain certain characters)
-            doc_id = doc_id.replace('?', '_').replace('&', '_').replace('=', '_')
+            doc_id = url.rstrip('/').rsplit('/', 1)[-1].translate(_ID_TRANS)
             return doc_id[:1500]  # Firestore limit
         
         # Fallback to SKU
@@ -107,45 +192,35 @@ class FirestoreAdapter:
         
         # Last resort: hash of title
         if product.get('title'):
-            import hashlib
+            # Non-cryptographic hash is enough for an ID; md5 only if xxhash is missing
+            if XXHASH_AVAILABLE:
+                return xxhash.xxh3_64_hexdigest(product['title'])
             return hashlib.md5(product['title'].encode()).hexdigest()
         
         raise ValueError("Product must have url, sku, or title for ID generation")
     
-    def _prepare_product(self, product: Dict) -> Dict:
+    def _prepare_product(self, product: Dict, now: datetime = None) -> Dict:
         """
         Prepare product data for Firestore.
         Converts timestamps, handles None values, etc.
         
         Args:
             product: Raw product dictionary
+            now: Timestamp for missing scraped_at/updated_at (pass one per
+                batch to avoid reading the clock per product)
             
         Returns:
             Cleaned product dictionary
         """
-        cleaned = {}
-        
-        for key, value in product.items():
-            # Skip None values
-            if value is None:
-                continue
-            
-            # Convert datetime strings to Firestore timestamps
-            if key in ['release_date', 'published_date', 'scraped_at', 'created_at', 'updated_at']:
-                if isinstance(value, str):
-                    try:
-                        from dateutil import parser as date_parser
-                        dt = date_parser.parse(value)
-                        cleaned[key] = dt
-                    except:
-                        cleaned[key] = value
-                else:
-                    cleaned[key] = value
-            else:
-                cleaned[key] = value
+        # Drop None values; convert datetime strings to Firestore timestamps
+        cleaned = {
+            key: _coerce_date(value) if key in _DATE_FIELDS and isinstance(value, str) else value
+            for key, value in product.items()
+            if value is not None
+        }
         
         # Add timestamps if not present
-        now = datetime.now(timezone.utc)
+        now = now or datetime.now(timezone.utc)
         if 'scraped_at' not in cleaned:
             cleaned['scraped_at'] = now
         if 'updated_at' not in cleaned:
@@ -167,23 +242,21 @@ class FirestoreAdapter:
         try:
             doc_id = self._generate_doc_id(product)
             cleaned = self._prepare_product(product)
+            cleaned['updated_at'] = firestore.SERVER_TIMESTAMP
             
-            # Check if document exists
-            doc_ref = self.db.collection(collection).document(doc_id)
-            doc = doc_ref.get()
-            
-            if doc.exists:
-                # Update existing document
-                cleaned['updated_at'] = datetime.now(timezone.utc)
-                doc_ref.update(cleaned)
-                self.stats['updated'] += 1
-                logger.debug(f"Updated: {product.get('title', doc_id)[:50]}")
-            else:
-                # Create new document
-                cleaned['created_at'] = datetime.now(timezone.utc)
-                doc_ref.set(cleaned)
+            # Try a create first: it stamps created_at only on new documents
+            # without reading the document beforehand
+            doc_ref = self._collection(collection).document(doc_id)
+            try:
+                doc_ref.create({**cleaned, 'created_at': firestore.SERVER_TIMESTAMP})
                 self.stats['saved'] += 1
                 logger.debug(f"Saved: {product.get('title', doc_id)[:50]}")
+            except AlreadyExists:
+                # Existing document: merge, keeping its original created_at
+                cleaned.pop('created_at', None)
+                doc_ref.set(cleaned, merge=True)
+                self.stats['updated'] += 1
+                logger.debug(f"Updated: {product.get('title', doc_id)[:50]}")
             
             return True
             
@@ -193,49 +266,79 @@ class FirestoreAdapter:
             self.stats['errors'] += 1
             return False
     
-    def save_products_batch(self, products: List[Dict], collection: str = 'sneakers') -> int:
+    def save_products_batch(self, products: List[Dict], collection: str = 'sneakers',
+                            batch_size: int = 50, same_keys: bool = False) -> int:
         """
-        Save multiple products using batch writes (faster).
-        Firestore allows up to 500 operations per batch.
+        Save multiple products through a Firestore BulkWriter (faster).
+        
+        BulkWriter handles batching, parallel commits, rate limiting with
+        ramp-up and per-document retries, so one bad document no longer
+        fails the writes batched alongside it.
         
         Args:
             products: List of product dictionaries
             collection: Firestore collection name
+            batch_size: Writes per commit (max 500, the Firestore limit).
+                Small batches keep latency even and limit what one failed
+                commit has to retry.
+            same_keys: Every product has the same keys as the first (rows
+                from one table), so products are prepared with a function
+                specialized for that key set
             
         Returns:
             Number of products saved
         """
+        if not 1 <= batch_size <= 500:
+            raise ValueError("batch_size must be between 1 and 500")
+        
+        now = datetime.now(timezone.utc)
+        if same_keys and products:
+            prepare = _shape_preparer(tuple(products[0]))
+        else:
+            prepare = self._prepare_product
+        bw = self.db.bulk_writer(options=BulkWriterOptions(**self.BULK_WRITER_OPTIONS))
+        bw.batch_size = batch_size
         saved_count = 0
-        batch_size = 500  # Firestore limit
+        # Callbacks fire on BulkWriter's worker threads
+        stats_lock = threading.Lock()
         
-        for i in range(0, len(products), batch_size):
-            batch_products = products[i:i + batch_size]
-            batch = self.db.batch()
-            
-            for product in batch_products:
+        def on_result(ref, result, writer):
+            nonlocal saved_count
+            with stats_lock:
+                saved_count += 1
+                self.stats['saved'] += 1
+        
+        def on_error(error, writer):
+            # Retry transient failures a few times before counting an error
+            if error.attempts < 3:
+                return True
+            logger.error(f"Error saving {error.operation.reference.id}: {error.message}")
+            with stats_lock:
+                self.stats['errors'] += 1
+            return False
+        
+        bw.on_write_result(on_result)
+        bw.on_write_error(on_error)
+        col_ref = self._collection(collection)
+        
+        try:
+            for product in products:
                 try:
                     doc_id = self._generate_doc_id(product)
-                    cleaned = self._prepare_product(product)
-                    
-                    doc_ref = self.db.collection(collection).document(doc_id)
+                    cleaned = prepare(product, now)
                     
-                    # Batch set (will overwrite existing docs)
-                    batch.set(doc_ref, cleaned, merge=True)
-                    saved_count += 1
+                    # Merge into existing docs
+                    bw.set(col_ref.document(doc_id), cleaned, merge=True)
                     
                 except Exception as e:
                     logger.error(f"Error preparing product for batch: {e}")
-                    self.stats['errors'] += 1
-            
-            try:
-                # Commit batch
-                batch.commit()
-                logger.info(f"Committed batch of {len(batch_products)} products")
-                self.stats['saved'] += len(batch_products)
-            except Exception as e:
-                logger.error(f"Error committing batch: {e}")
-                self.stats['errors'] += len(batch_products)
+                    with stats_lock:
+                        self.stats['errors'] += 1
+        finally:
+            # Flushes outstanding writes and waits for them to finish
+            bw.close()
         
+        logger.info(f"Bulk wrote {saved_count} of {len(products)} products")
         return saved_count
     
     def save_products(self, products: List[Dict], collection: str = 'sneakers', 
@@ -264,20 +367,20 @@ class FirestoreAdapter:
         """Get save statistics."""
         return self.stats.copy()
     
-    def query_products(self, collection: str = 'sneakers', 
-                      filters: Dict = None, limit: int = 100) -> List[Dict]:
+    def iter_products(self, collection: str = 'sneakers',
+                      filters: Dict = None, limit: int = 100):
         """
-        Query products from Firestore.
+        Stream products from Firestore, one dict at a time.
         
         Args:
             collection: Collection name
             filters: Dictionary of filters (e.g., {'brand': 'Nike', 'status': 'upcoming'})
             limit: Maximum number of results
             
-        Returns:
-            List of product dictionaries
+        Yields:
+            Product dictionaries (with the document ID as 'id')
         """
-        query = self.db.collection(collection)
+        query = self._collection(collection)
         
         # Apply filters
         if filters:
@@ -288,15 +391,23 @@ class FirestoreAdapter:
         query = query.limit(limit)
         
         # Execute query
-        docs = query.stream()
-        
-        results = []
-        for doc in docs:
-            data = doc.to_dict()
-            data['id'] = doc.id
-            results.append(data)
+        for doc in query.stream():
+            yield {**doc.to_dict(), 'id': doc.id}
+    
+    def query_products(self, collection: str = 'sneakers', 
+                      filters: Dict = None, limit: int = 100) -> List[Dict]:
+        """
+        Query products from Firestore (see iter_products to stream instead).
         
-        return results
+        Args:
+            collection: Collection name
+            filters: Dictionary of filters (e.g., {'brand': 'Nike', 'status': 'upcoming'})
+            limit: Maximum number of results
+            
+        Returns:
+            List of product dictionaries
+        """
+        return list(self.iter_products(collection, filters, limit))
 
 
 def migrate_postgres_to_firestore(postgres_conn_string: str, 
@@ -321,36 +432,72 @@ def migrate_postgres_to_firestore(postgres_conn_string: str,
     
     # Connect to PostgreSQL
     conn = psycopg2.connect(postgres_conn_string)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
     
-    # Get total count
-    cursor.execute(f"SELECT COUNT(*) as total FROM {table}")
-    total = cursor.fetchone()['total']
-    logger.info(f"Total rows to migrate: {total}")
+    # Planner's row estimate, for progress only; an exact COUNT(*) would
+    # scan the whole table before migrating anything
+    with conn.cursor() as est_cursor:
+        est_cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", (table,))
+        row = est_cursor.fetchone()
+        total = max(row[0], 0) if row else 0
+    logger.info(f"Estimated rows to migrate: {total}")
+    
+    # Named (server-side) cursor: one scan of the table, streamed to us
+    # batch_size rows at a time instead of re-scanning for every OFFSET
+    cursor = conn.cursor(name='sr_migrate', cursor_factory=RealDictCursor)
+    cursor.itersize = batch_size
+    cursor.execute(f"SELECT * FROM {table}")
+    
+    # Pipeline: a reader thread fetches the next batch from Postgres while
+    # this thread writes the previous one to Firestore. The small bound
+    # keeps the reader at most a couple of batches ahead.
+    batches = queue.Queue(maxsize=2)
+    reader_error = []
+    
+    def read_batches():
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                # Convert to list of dicts
+                batches.put([dict(row) for row in rows])
+        except Exception as e:
+            reader_error.append(e)
+        finally:
+            batches.put(None)  # End of stream
+    
+    reader = threading.Thread(target=read_batches, name='pg-reader', daemon=True)
+    reader.start()
     
-    # Migrate in batches
-    offset = 0
     migrated = 0
     
-    while offset < total:
-        cursor.execute(f"SELECT * FROM {table} LIMIT {batch_size} OFFSET {offset}")
-        rows = cursor.fetchall()
-        
-        if not rows:
-            break
-        
-        # Convert to list of dicts
-        products = [dict(row) for row in rows]
-        
-        # Save to Firestore
-        saved = firestore_adapter.save_products(products, collection, use_batch=True)
-        migrated += saved
-        offset += len(rows)
-        
-        logger.info(f"Migrated {migrated}/{total} rows ({(migrated/total)*100:.1f}%)")
+    try:
+        while True:
+            products = batches.get()
+            if products is None:
+                break
+            
+            # Save to Firestore; SELECT * rows all share one key set
+            saved = firestore_adapter.save_products_batch(products, collection, same_keys=True)
+            migrated += saved
+            
+            if total:
+                logger.info(f"Migrated {migrated}/~{total} rows ({(migrated/total)*100:.1f}%)")
+            else:
+                logger.info(f"Migrated {migrated} rows")
+    finally:
+        # Unblock the reader if we stopped early, then wait for it
+        while reader.is_alive():
+            try:
+                batches.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        reader.join()
+        cursor.close()
+        conn.close()
     
-    cursor.close()
-    conn.close()
+    if reader_error:
+        raise reader_error[0]
     
     logger.info(f"Migration complete: {migrated} rows migrated")
     return migrated
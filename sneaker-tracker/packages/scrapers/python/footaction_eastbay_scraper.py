@@ -19,18 +19,20 @@ Usage:
     python footaction_eastbay_scraper.py --retailer footaction --limit 20
     python footaction_eastbay_scraper.py --retailer eastbay --limit 20
     python footaction_eastbay_scraper.py --both --limit 40
+    python footaction_eastbay_scraper.py --both --firestore-collection sneakers_canonical
 """
 
 import os
 import sys
-import json
+import asyncio
 import logging
 import argparse
 from datetime import datetime, timezone
 from typing import List, Dict, Optional
 
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+import orjson
+from selectolax.parser import HTMLParser
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -58,23 +60,42 @@ RETAILERS = {
 }
 
 
+def make_session() -> aiohttp.ClientSession:
+    """
+    Shared HTTP session for all retailers.
+    
+    Both sites sit behind the same CDN, so one pool of TCP/TLS connections
+    serves them; the per-host cap keeps either site from seeing a burst.
+    """
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=20, limit_per_host=8),
+        timeout=aiohttp.ClientTimeout(total=30)
+    )
+
+
 class FootactionEastbayScraper:
     """Unified scraper for Footaction and Eastbay."""
     
-    def __init__(self, retailer: str = 'footaction'):
+    def __init__(self, retailer: str = 'footaction', session: aiohttp.ClientSession = None):
+        """
+        Args:
+            retailer: 'footaction' or 'eastbay'
+            session: Shared session from make_session(); pass the same one to
+                every scraper so they share a connection pool
+        """
         if retailer not in RETAILERS:
             raise ValueError(f"Retailer must be 'footaction' or 'eastbay', got: {retailer}")
         
         self.retailer = retailer
         self.config = RETAILERS[retailer]
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.session = session
+        self.headers = {
             'User-Agent': self.config['user_agent'],
             'Accept': 'application/json, text/html',
             'Accept-Language': 'en-US,en;q=0.9'
-        })
+        }
     
-    def scrape_launches(self, limit: int = 50) -> List[Dict]:
+    async def scrape_launches(self, limit: int = 50) -> List[Dict]:
         """
         Scrape launch calendar releases.
         
@@ -84,24 +105,31 @@ class FootactionEastbayScraper:
         Returns:
             List of release dictionaries
         """
+        if self.session is None:
+            async with make_session() as session:
+                self.session = session
+                try:
+                    return await self.scrape_launches(limit)
+                finally:
+                    self.session = None
+        
         logger.info(f"Scraping {self.config['name']} launches (limit={limit})")
         
         releases = []
         
         # Try API endpoint first
         try:
-            response = self.session.get(self.config['launch_api'], timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                releases = self._parse_api_response(data)
-                logger.info(f"Got {len(releases)} releases from API")
+            async with self.session.get(self.config['launch_api'], headers=self.headers) as response:
+                if response.status == 200:
+                    data = orjson.loads(await response.read())
+                    releases = self._parse_api_response(data)
+                    logger.info(f"Got {len(releases)} releases from API")
         except Exception as e:
             logger.warning(f"API request failed: {e}, trying HTML scraping")
         
         # Fallback to HTML scraping
         if not releases:
-            releases = self._scrape_html_calendar(limit)
+            releases = await self._scrape_html_calendar(limit)
         
         logger.info(f"Scraped {len(releases)} releases from {self.config['name']}")
         return releases[:limit]
@@ -135,22 +163,22 @@ class FootactionEastbayScraper:
         
         return releases
     
-    def _scrape_html_calendar(self, limit: int) -> List[Dict]:
+    async def _scrape_html_calendar(self, limit: int) -> List[Dict]:
         """Scrape launch calendar from HTML page."""
         releases = []
         
         calendar_url = f"{self.config['base_url']}/release-dates"
         
         try:
-            response = self.session.get(calendar_url, timeout=30)
-            response.raise_for_status()
+            async with self.session.get(calendar_url, headers=self.headers) as response:
+                response.raise_for_status()
+                content = await response.read()
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            tree = HTMLParser(content)
             
-            # Find product cards (adjust selectors based on actual HTML)
-            product_cards = soup.find_all('div', class_='product-card') or \
-                           soup.find_all('article', class_='product') or \
-                           soup.find_all('div', {'data-product': True})
+            # Find product cards (adjust selectors based on actual HTML);
+            # all card layouts are matched in one CSS pass
+            product_cards = tree.css('div.product-card, article.product, div[data-product]')
             
             logger.info(f"Found {len(product_cards)} product cards in HTML")
             
@@ -165,19 +193,19 @@ class FootactionEastbayScraper:
         return releases
     
     def _parse_product_card(self, card) -> Optional[Dict]:
-        """Parse a product card element."""
+        """Parse a product card node (selectolax)."""
         try:
-            name_elem = card.find('h3') or card.find(class_='product-name')
-            name = name_elem.get_text(strip=True) if name_elem else 'Unknown'
+            name_elem = card.css_first('h3, .product-name')
+            name = name_elem.text(strip=True) if name_elem else 'Unknown'
             
-            price_elem = card.find(class_='price')
-            price = price_elem.get_text(strip=True) if price_elem else None
+            price_elem = card.css_first('.price')
+            price = price_elem.text(strip=True) if price_elem else None
             
-            img_elem = card.find('img')
-            image_url = img_elem.get('src') or img_elem.get('data-src') if img_elem else None
+            img_elem = card.css_first('img')
+            image_url = img_elem.attributes.get('src') or img_elem.attributes.get('data-src') if img_elem else None
             
-            link_elem = card.find('a')
-            product_url = link_elem.get('href') if link_elem else None
+            link_elem = card.css_first('a')
+            product_url = link_elem.attributes.get('href') if link_elem else None
             if product_url and not product_url.startswith('http'):
                 product_url = self.config['base_url'] + product_url
             
@@ -202,6 +230,16 @@ class FootactionEastbayScraper:
         return f"{self.config['base_url']}/product/{product_id}"
 
 
+async def scrape_retailers(retailers: List[str], limit: int) -> List[Dict]:
+    """Scrape retailers concurrently over one shared session."""
+    async with make_session() as session:
+        results = await asyncio.gather(*(
+            FootactionEastbayScraper(retailer, session).scrape_launches(limit=limit)
+            for retailer in retailers
+        ))
+    return [release for releases in results for release in releases]
+
+
 def main():
     """Main execution."""
     parser = argparse.ArgumentParser(description='Footaction/Eastbay Scraper')
@@ -210,22 +248,34 @@ def main():
     parser.add_argument('--both', action='store_true', help='Scrape both retailers')
     parser.add_argument('--limit', type=int, default=50, help='Maximum releases per retailer')
     parser.add_argument('--output', type=str, default='releases.json', help='Output file')
+    parser.add_argument('--firestore-collection', type=str,
+                       help='Save releases straight to this Firestore collection instead of --output')
     
     args = parser.parse_args()
     
-    all_releases = []
     retailers_to_scrape = ['footaction', 'eastbay'] if args.both else [args.retailer]
+    all_releases = asyncio.run(scrape_retailers(retailers_to_scrape, args.limit))
     
-    for retailer in retailers_to_scrape:
-        scraper = FootactionEastbayScraper(retailer)
-        releases = scraper.scrape_launches(limit=args.limit)
-        all_releases.extend(releases)
-    
-    # Save to JSON
-    with open(args.output, 'w', encoding='utf-8') as f:
-        json.dump(all_releases, f, indent=2, ensure_ascii=False)
-    
-    logger.info(f"Saved {len(all_releases)} releases to {args.output}")
+    if args.firestore_collection:
+        # Push in-process: one adapter (one Firestore client) for every retailer,
+        # and no JSON file round trip
+        from firestore_adapter import FirestoreAdapter
+        
+        adapter = FirestoreAdapter()
+        # The adapter keys documents by url / sku / title
+        products = [
+            {**release, 'url': release.get('product_url'), 'title': release.get('name')}
+            for release in all_releases
+        ]
+        saved = adapter.save_products(products, args.firestore_collection)
+        destination = f"Firestore collection {args.firestore_collection}"
+        logger.info(f"Saved {saved}/{len(all_releases)} releases to {destination}")
+    else:
+        # Save to JSON
+        with open(args.output, 'wb') as f:
+            f.write(orjson.dumps(all_releases, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        destination = args.output
+        logger.info(f"Saved {len(all_releases)} releases to {args.output}")
     
     # Print summary
     print(f"\n{'='*60}")
@@ -233,13 +283,13 @@ def main():
     print(f"{'='*60}")
     print(f"Total releases: {len(all_releases)}")
     print(f"Retailers scraped: {', '.join(retailers_to_scrape)}")
-    print(f"Output file: {args.output}")
+    print(f"Output: {destination}")
     print(f"{'='*60}\n")
     
     # Show sample
     if all_releases:
         print("Sample release:")
-        print(json.dumps(all_releases[0], indent=2))
+        print(orjson.dumps(all_releases[0], option=orjson.OPT_INDENT_2).decode('utf-8'))
 
 
 if __name__ == '__main__':
@@ -2,7 +2,7 @@
 Foot Locker Release Calendar Scraper
 
 Scrapes upcoming sneaker releases from Foot Locker's release calendar.
-Uses BeautifulSoup for static content and Playwright for dynamic JavaScript-loaded content.
+Uses selectolax for static content and Playwright for dynamic JavaScript-loaded content.
 
 Features:
 - Scrapes release dates, product names, prices, images
@@ -17,6 +17,9 @@ Usage:
     # Scrape all upcoming releases
     python footlocker_scraper.py --category all --limit 50
 
+    # Scrape several categories (pages fetched concurrently)
+    python footlocker_scraper.py --category jordan nike adidas --limit 20
+
     # Test mode (don't save to database)
     python footlocker_scraper.py --category nike --limit 5 --no-save
 """
@@ -24,6 +27,7 @@ Usage:
 import os
 import sys
 import time
+import asyncio
 import logging
 import argparse
 import hashlib
@@ -32,17 +36,31 @@ from typing import List, Dict, Optional
 from urllib.parse import urljoin, urlparse
 from urllib.robotparser import RobotFileParser
 
-import requests
-from bs4 import BeautifulSoup
+import httpx
+from selectolax.parser import HTMLParser
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from base_scraper import _brand_re
+
 # Load environment variables
 load_dotenv()
 
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 # Try to import Playwright (optional for dynamic content)
 try:
-    from playwright.sync_api import sync_playwright, Page
+    from playwright.async_api import async_playwright, Page
     PLAYWRIGHT_AVAILABLE = True
 except ImportError:
     PLAYWRIGHT_AVAILABLE = False
@@ -56,6 +74,15 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+BRANDS = (
+    ('Jordan', ('jordan', 'aj')),
+    ('Nike', ('nike',)),
+    ('adidas', ('adidas', 'yeezy')),
+    ('New Balance', ('new balance', 'nb')),
+)
+_BRAND_RE = _brand_re(BRANDS)
+
+
 class FootLockerScraper:
     """Scraper for Foot Locker release calendar."""
     
@@ -72,6 +99,18 @@ class FootLockerScraper:
         'upcoming': '/release-dates/upcoming',
     }
     
+    # Conservative rate limiting for retailer sites: seconds between requests
+    # to the same host, and pages in flight at once
+    REQUEST_DELAY = 2.0
+    MAX_CONCURRENT_REQUESTS = 4
+    # Browser tabs open at once when rendering pages with Playwright
+    MAX_BROWSER_TABS = 5
+    # Pooled keep-alive connections for the HTTP client, and the transient
+    # server errors that are retried with backoff
+    CONNECTION_POOL_SIZE = 32
+    RETRY_STATUSES = (500, 502, 503, 504)
+    RETRY_BACKOFF = 0.3
+    
     def __init__(self, supabase_url: str = None, supabase_key: str = None):
         """Initialize scraper."""
         # Supabase client
@@ -80,15 +119,21 @@ class FootLockerScraper:
             supabase_key or os.getenv('SUPABASE_KEY')
         )
         
-        # HTTP session
-        self.session = requests.Session()
-        self.session.headers.update({
+        # Request headers for page fetches
+        self.headers = {
             'User-Agent': self.USER_AGENT,
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
-        })
+        }
+        
+        # Absolute URL of every category page
+        self._category_urls = {
+            category: urljoin(self.BASE_URL, path)
+            for category, path in self.CATEGORIES.items()
+        }
         
-        # robots.txt checker
+        # robots.txt checker (answers are cached per URL)
+        self._can_fetch_cache = {}
         self.robot_parser = RobotFileParser()
         self.robot_parser.set_url(f"{self.BASE_URL}/robots.txt")
         try:
@@ -105,47 +150,127 @@ class FootLockerScraper:
             'blocked_by_robots': 0,
             'pages_scraped': 0
         }
+        
+        # Playwright browser shared by every rendered page (started lazily)
+        self._pw = None
+        self._browser = None
+        self._ctx = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
+    async def _ensure_browser(self):
+        """Browser context for Playwright fetches, launched on first use."""
+        if self._ctx is None:
+            self._pw = await async_playwright().start()
+            self._browser = await self._pw.chromium.launch(headless=True)
+            self._ctx = await self._browser.new_context(user_agent=self.USER_AGENT)
+        return self._ctx
+    
+    async def aclose(self):
+        """Shut down the shared browser, if one was started."""
+        if self._browser:
+            await self._browser.close()
+        if self._pw:
+            await self._pw.stop()
+        self._pw = self._browser = self._ctx = None
     
     def can_fetch(self, url: str) -> bool:
         """Check if URL can be fetched per robots.txt."""
-        return self.robot_parser.can_fetch(self.USER_AGENT, url)
+        allowed = self._can_fetch_cache.get(url)
+        if allowed is None:
+            allowed = self._can_fetch_cache[url] = self.robot_parser.can_fetch(self.USER_AGENT, url)
+        return allowed
     
-    def fetch_page(self, url: str, retry_count: int = 3) -> Optional[BeautifulSoup]:
-        """Fetch page with BeautifulSoup."""
+    async def fetch_pages(self, urls: List[str]) -> List[Optional[bytes]]:
+        """
+        Fetch several pages concurrently over one HTTP client.
+        
+        Requests to a host are still started REQUEST_DELAY apart, but one
+        page's latency no longer holds up the next.
+        
+        Returns:
+            Page bodies in the order of urls (None where a page was blocked,
+            missing or failed)
+        """
+        sem = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        next_slot = {}  # host -> earliest start time of its next request
+        
+        async with httpx.AsyncClient(
+            headers=self.headers,
+            http2=HTTP2_AVAILABLE,
+            timeout=30,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.CONNECTION_POOL_SIZE,
+                max_keepalive_connections=self.CONNECTION_POOL_SIZE,
+            )
+        ) as client:
+            return await asyncio.gather(
+                *(self._fetch_body(client, url, sem, next_slot) for url in urls)
+            )
+    
+    async def _fetch_body(self, client: httpx.AsyncClient, url: str, sem: asyncio.Semaphore,
+                          next_slot: Dict[str, float], retry_count: int = 3) -> Optional[bytes]:
+        """
+        Fetch one page for fetch_pages.
+        
+        Retry rules: a 429 waits for Retry-After (default 120s) and retries;
+        a RETRY_STATUSES error retries after Retry-After if given, else
+        RETRY_BACKOFF * 2**attempt seconds; a 404 or other HTTP error gives
+        up; network errors retry with exponential backoff (1s, 2s, ...).
+        At most retry_count attempts are made.
+        """
         if not self.can_fetch(url):
             logger.warning(f"Blocked by robots.txt: {url}")
             self.stats['blocked_by_robots'] += 1
             return None
         
-        time.sleep(2.0)  # Conservative rate limiting for retailer sites
-        
-        for attempt in range(retry_count):
-            try:
-                response = self.session.get(url, timeout=30)
-                response.raise_for_status()
-                self.stats['pages_scraped'] += 1
-                return BeautifulSoup(response.content, 'lxml')
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:
-                    retry_after = int(e.response.headers.get('Retry-After', 120))
-                    logger.warning(f"Rate limited. Waiting {retry_after}s...")
-                    time.sleep(retry_after)
-                    continue
-                elif e.response.status_code == 404:
-                    logger.warning(f"Page not found: {url}")
-                    return None
-                else:
-                    logger.error(f"HTTP error {e.response.status_code}: {url}")
-                    if attempt == retry_count - 1:
+        host = urlparse(url).netloc
+        loop = asyncio.get_running_loop()
+        
+        async with sem:
+            for attempt in range(retry_count):
+                # Reserve this host's next request slot, then wait for it
+                now = loop.time()
+                start = max(now, next_slot.get(host, now))
+                next_slot[host] = start + self.REQUEST_DELAY
+                await asyncio.sleep(start - now)
+                
+                try:
+                    response = await client.get(url)
+                    response.raise_for_status()
+                    self.stats['pages_scraped'] += 1
+                    return response.content
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code == 429:
+                        retry_after = int(e.response.headers.get('Retry-After', 120))
+                        logger.warning(f"Rate limited. Waiting {retry_after}s...")
+                        await asyncio.sleep(retry_after)
+                        continue
+                    elif e.response.status_code in self.RETRY_STATUSES and attempt < retry_count - 1:
+                        retry_after = e.response.headers.get('Retry-After', '')
+                        delay = int(retry_after) if retry_after.isdigit() else self.RETRY_BACKOFF * 2 ** attempt
+                        logger.warning(f"HTTP {e.response.status_code} from {url}. Retrying in {delay}s...")
+                        await asyncio.sleep(delay)
+                        continue
+                    elif e.response.status_code == 404:
+                        logger.warning(f"Page not found: {url}")
+                        return None
+                    else:
+                        logger.error(f"HTTP error {e.response.status_code}: {url}")
                         self.stats['errors'] += 1
-                    return None
-            except Exception as e:
-                logger.error(f"Error fetching {url}: {e}")
-                if attempt < retry_count - 1:
-                    time.sleep(2 ** attempt)
-                else:
-                    self.stats['errors'] += 1
-                    return None
+                        return None
+                except Exception as e:
+                    logger.error(f"Error fetching {url}: {e}")
+                    if attempt < retry_count - 1:
+                        await asyncio.sleep(2 ** attempt)
+                    else:
+                        self.stats['errors'] += 1
+                        return None
         
         return None
     
@@ -169,36 +294,45 @@ class FootLockerScraper:
             self.stats['errors'] += 1
             return None
     
-    def parse_product(self, product_elem, base_url: str) -> Optional[Dict]:
+    def parse_product(self, product_elem, base_url: str, scraped_at: str = None) -> Optional[Dict]:
         """
-        Parse product information from HTML element.
+        Parse product information from an HTML node (selectolax).
         
         Note: Foot Locker's actual HTML structure may differ.
         Update selectors based on live site inspection.
+        
+        Args:
+            product_elem: Product card node
+            base_url: Page URL, for resolving relative links
+            scraped_at: ISO timestamp shared by the batch (defaults to now)
         """
         try:
             # Example selectors (UPDATE THESE after inspecting live site)
-            title_elem = product_elem.select_one('h3.product-title, .ProductCard-title')
-            price_elem = product_elem.select_one('span.price, .ProductCard-price')
-            date_elem = product_elem.select_one('span.release-date, .ProductCard-date')
-            image_elem = product_elem.select_one('img.product-image, .ProductCard-image')
-            link_elem = product_elem.select_one('a.product-link, .ProductCard-link')
+            title_elem = product_elem.css_first('h3.product-title, .ProductCard-title')
+            price_elem = product_elem.css_first('span.price, .ProductCard-price')
+            date_elem = product_elem.css_first('span.release-date, .ProductCard-date')
+            image_elem = product_elem.css_first('img.product-image, .ProductCard-image')
+            link_elem = product_elem.css_first('a.product-link, .ProductCard-link')
             
             if not title_elem:
                 return None
             
             # Extract data
-            title = title_elem.get_text(strip=True)
-            price = price_elem.get_text(strip=True) if price_elem else None
-            release_date = date_elem.get_text(strip=True) if date_elem else None
-            image_url = image_elem.get('src') if image_elem else None
-            product_url = link_elem.get('href') if link_elem else None
+            title = title_elem.text(strip=True)
+            price = price_elem.text(strip=True) if price_elem else None
+            release_date = date_elem.text(strip=True) if date_elem else None
+            image_url = image_elem.attributes.get('src') if image_elem else None
+            product_url = link_elem.attributes.get('href') if link_elem else None
             
             if product_url:
                 product_url = urljoin(base_url, product_url)
             
-            # Generate unique ID
-            product_id = hashlib.md5(f"{title}{release_date}".encode()).hexdigest()[:16]
+            # Generate unique ID (identity key only, so a fast non-cryptographic hash)
+            id_key = f"{title}|{release_date or ''}".encode()
+            if XXHASH_AVAILABLE:
+                product_id = xxhash.xxh128(id_key).hexdigest()[:16]
+            else:
+                product_id = hashlib.md5(id_key).hexdigest()[:16]
             
             return {
                 'id': f'footlocker::{product_id}',
@@ -208,7 +342,7 @@ class FootLockerScraper:
                 'release_date': release_date,
                 'image_url': image_url,
                 'product_url': product_url,
-                'scraped_at': datetime.now(timezone.utc).isoformat(),
+                'scraped_at': scraped_at or datetime.now(timezone.utc).isoformat(),
                 'metadata': {
                     'brand': self._extract_brand(title),
                     'category': 'sneakers'
@@ -222,16 +356,8 @@ class FootLockerScraper:
     
     def _extract_brand(self, title: str) -> str:
         """Extract brand from product title."""
-        title_lower = title.lower()
-        if 'jordan' in title_lower or 'aj' in title_lower:
-            return 'Jordan'
-        elif 'nike' in title_lower:
-            return 'Nike'
-        elif 'adidas' in title_lower or 'yeezy' in title_lower:
-            return 'adidas'
-        elif 'new balance' in title_lower or 'nb' in title_lower:
-            return 'New Balance'
-        return 'Unknown'
+        match = _BRAND_RE.search(title)
+        return BRANDS[int(match.lastgroup[1:])][0] if match else 'Unknown'
     
     def scrape_category(self, category: str, limit: int = 50, use_playwright: bool = False) -> List[Dict]:
         """
@@ -242,65 +368,83 @@ class FootLockerScraper:
             limit: Max products to scrape
             use_playwright: Use Playwright for dynamic content
         """
-        if category not in self.CATEGORIES:
-            logger.error(f"Unknown category: {category}")
-            return []
+        return self.scrape_categories([category], limit, use_playwright)
+    
+    def scrape_categories(self, categories: List[str], limit: int = 50,
+                          use_playwright: bool = False) -> List[Dict]:
+        """
+        Scrape several categories, fetching their pages concurrently.
         
-        url = urljoin(self.BASE_URL, self.CATEGORIES[category])
-        logger.info(f"Scraping {category} from {url}")
+        Args:
+            categories: Category names (e.g., ['jordan', 'nike'])
+            limit: Max products to scrape per category
+            use_playwright: Use Playwright for dynamic content
+        """
+        urls = []
+        for category in categories:
+            url = self._category_urls.get(category)
+            if url is None:
+                logger.error(f"Unknown category: {category}")
+                continue
+            logger.info(f"Scraping {category} from {url}")
+            urls.append(url)
         
-        products = []
+        if not urls:
+            return []
+        
+        # One timestamp for every product in this scrape
+        scraped_at = datetime.now(timezone.utc).isoformat()
         
         if use_playwright and PLAYWRIGHT_AVAILABLE:
             # Use Playwright for JavaScript-rendered content
-            import asyncio
-            
-            async def scrape_with_playwright():
-                async with sync_playwright() as p:
-                    browser = await p.chromium.launch(headless=True)
-                    page = await browser.new_page()
-                    await page.set_extra_http_headers({'User-Agent': self.USER_AGENT})
-                    
+            return asyncio.run(self._scrape_rendered(urls, limit, scraped_at))
+        
+        # Static content
+        bodies = asyncio.run(self.fetch_pages(urls))
+        
+        products = []
+        for url, body in zip(urls, bodies):
+            if body:
+                products.extend(self._parse_listing(body, url, limit, scraped_at))
+        return products
+    
+    async def _scrape_rendered(self, urls: List[str], limit: int, scraped_at: str) -> List[Dict]:
+        """Render pages as tabs of one shared browser, closing it when done."""
+        sem = asyncio.Semaphore(self.MAX_BROWSER_TABS)
+        
+        async def scrape_one(ctx, url):
+            async with sem:
+                page = await ctx.new_page()
+                try:
                     html = await self.fetch_page_playwright(url, page)
-                    await browser.close()
-                    
-                    if not html:
-                        return []
-                    
-                    soup = BeautifulSoup(html, 'lxml')
-                    # Update selector based on live site
-                    product_elems = soup.select('div.ProductCard, .product-item, article.product')
-                    
-                    logger.info(f"Found {len(product_elems)} products")
-                    
-                    for elem in product_elems[:limit]:
-                        product = self.parse_product(elem, url)
-                        if product:
-                            products.append(product)
-                            self.stats['products_scraped'] += 1
-                    
-                    return products
-            
-            return asyncio.run(scrape_with_playwright())
+                finally:
+                    await page.close()
+            return self._parse_listing(html, url, limit, scraped_at) if html else []
         
-        else:
-            # Use BeautifulSoup for static content
-            soup = self.fetch_page(url)
-            if not soup:
-                return products
-            
-            # Update selector based on live Foot Locker site structure
-            product_elems = soup.select('div.ProductCard, .product-item, article.product')
-            
-            logger.info(f"Found {len(product_elems)} products")
-            
-            for elem in product_elems[:limit]:
-                product = self.parse_product(elem, url)
-                if product:
-                    products.append(product)
-                    self.stats['products_scraped'] += 1
-            
-            return products
+        try:
+            ctx = await self._ensure_browser()
+            results = await asyncio.gather(*(scrape_one(ctx, url) for url in urls))
+        finally:
+            await self.aclose()
+        
+        return [product for products in results for product in products]
+    
+    def _parse_listing(self, html, url: str, limit: int, scraped_at: str) -> List[Dict]:
+        """Parse up to limit products from a category page's HTML."""
+        tree = HTMLParser(html)
+        # Update selector based on live Foot Locker site structure
+        product_elems = tree.css('div.ProductCard, .product-item, article.product')
+        
+        logger.info(f"Found {len(product_elems)} products")
+        
+        products = []
+        for elem in product_elems[:limit]:
+            product = self.parse_product(elem, url, scraped_at)
+            if product:
+                products.append(product)
+                self.stats['products_scraped'] += 1
+        
+        return products
     
     def save_to_supabase(self, products: List[Dict]):
         """Save products to Supabase with upsert (update if exists)."""
@@ -316,9 +460,10 @@ class FootLockerScraper:
             logger.error(f"Error saving to Supabase: {e}", exc_info=True)
             self.stats['errors'] += 1
     
-    def run(self, category: str, limit: int = 50, save: bool = True, use_playwright: bool = False) -> Dict:
+    def run(self, category, limit: int = 50, save: bool = True, use_playwright: bool = False) -> Dict:
         """
-        Run the scraper for a category.
+        Run the scraper for a category, or a list of categories (pages for
+        all of them are fetched concurrently).
         
         Returns:
             Stats dictionary with scrape results
@@ -328,7 +473,8 @@ class FootLockerScraper:
         logger.info(f"Starting Foot Locker scraper (category={category}, limit={limit}, save={save})")
         
         # Scrape products
-        products = self.scrape_category(category, limit, use_playwright)
+        categories = [category] if isinstance(category, str) else list(category)
+        products = self.scrape_categories(categories, limit, use_playwright)
         
         # Save to database
         if save and products:
@@ -351,14 +497,15 @@ def main():
     parser.add_argument(
         '--category',
         choices=list(FootLockerScraper.CATEGORIES.keys()),
-        default='all',
-        help='Category to scrape'
+        nargs='+',
+        default=['all'],
+        help='Categories to scrape'
     )
     parser.add_argument(
         '--limit',
         type=int,
         default=50,
-        help='Max products to scrape'
+        help='Max products to scrape per category'
     )
     parser.add_argument(
         '--no-save',
@@ -384,7 +531,7 @@ def main():
     
     # Print results
     print(f"\n{'='*80}\nFOOT LOCKER SCRAPER RESULTS\n{'='*80}")
-    print(f"Category: {args.category}")
+    print(f"Categories: {', '.join(args.category)}")
     print(f"Products scraped: {stats['products_scraped']}")
     print(f"Errors: {stats['errors']}")
     print(f"Pages scraped: {stats['pages_scraped']}")
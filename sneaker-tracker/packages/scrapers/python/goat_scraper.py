@@ -10,9 +10,39 @@ from typing import List, Dict, Any
 from datetime import datetime
 import httpx
 
-from base_scraper import BaseSneakerScraper
+from base_scraper import BaseSneakerScraper, _brand_re, close_browser
 from playwright.async_api import Page
 
+
+BRANDS = (
+    ("Nike", ("nike", "jordan", "air jordan", "dunk", "air max")),
+    ("Adidas", ("adidas", "yeezy", "ultraboost")),
+    ("New Balance", ("new balance", "nb")),
+    ("ASICS", ("asics", "gel")),
+    ("Reebok", ("reebok",)),
+    ("Puma", ("puma",)),
+    ("Salomon", ("salomon",)),
+    ("Vans", ("vans",)),
+)
+_BRAND_RE = _brand_re(BRANDS)
+
+PRODUCT_CARD_SELECTOR = '[data-testid="product-card"]'
+
+# Pulls the fields of the first `limit` product cards in one browser round-trip
+EXTRACT_CARDS_JS = """
+([selector, limit]) => Array.from(document.querySelectorAll(selector)).slice(0, limit).map(el => {
+    const link = el.querySelector('a');
+    return {
+        name: el.querySelector('[data-testid="product-name"]')?.innerText ?? null,
+        priceText: el.querySelector('[data-testid="lowest-price"]')?.innerText ?? null,
+        imageUrl: el.querySelector('img')?.getAttribute('src') ?? null,
+        hasLink: link !== null,
+        productUrl: link?.getAttribute('href') ?? null,
+    };
+})
+"""
+
+
 class GOATScraper(BaseSneakerScraper):
     """
     GOAT scraper using their internal GraphQL API
@@ -73,27 +103,21 @@ class GOATScraper(BaseSneakerScraper):
         releases = []
         
         # Navigate to sneakers page
-        await page.goto("https://www.goat.com/sneakers", wait_until="networkidle")
+        await page.goto("https://www.goat.com/sneakers", wait_until="domcontentloaded")
         
         # Wait for product grid
-        await page.wait_for_selector('[data-testid="product-card"]', timeout=10000)
+        await page.wait_for_selector(PRODUCT_CARD_SELECTOR, timeout=10000)
         
-        # Extract product cards
-        products = await page.query_selector_all('[data-testid="product-card"]')
+        # Extract product cards (first 50) in a single evaluate call
+        cards = await page.evaluate(EXTRACT_CARDS_JS, [PRODUCT_CARD_SELECTOR, 50])
         
-        for product in products[:50]:  # Limit to first 50
+        for card in cards:
             try:
-                # Extract data from card
-                name_el = await product.query_selector('[data-testid="product-name"]')
-                price_el = await product.query_selector('[data-testid="lowest-price"]')
-                image_el = await product.query_selector('img')
-                link_el = await product.query_selector('a')
+                name = card["name"]
                 
-                if name_el and link_el:
-                    name = await name_el.inner_text()
-                    price_text = await price_el.inner_text() if price_el else None
-                    image_url = await image_el.get_attribute('src') if image_el else None
-                    product_url = await link_el.get_attribute('href')
+                if name is not None and card["hasLink"]:
+                    price_text = card["priceText"]
+                    product_url = card["productUrl"]
                     
                     # Parse SKU from URL
                     sku = product_url.split('/')[-1] if product_url else None
@@ -102,7 +126,7 @@ class GOATScraper(BaseSneakerScraper):
                         "shoe_name": name.strip(),
                         "style_code": sku,
                         "retail_price": self._parse_goat_price(price_text),
-                        "image_url": image_url,
+                        "image_url": card["imageUrl"],
                         "product_url": f"https://www.goat.com{product_url}" if product_url else None,
                         "brand": self._detect_brand_from_name(name),
                         "status": "available",  # GOAT only shows available items
@@ -162,24 +186,8 @@ class GOATScraper(BaseSneakerScraper):
     
     def _detect_brand_from_name(self, name: str) -> str:
         """Detect brand from product name"""
-        name_lower = name.lower()
-        
-        brands = {
-            "Nike": ["nike", "jordan", "air jordan", "dunk", "air max"],
-            "Adidas": ["adidas", "yeezy", "ultraboost"],
-            "New Balance": ["new balance", "nb"],
-            "ASICS": ["asics", "gel"],
-            "Reebok": ["reebok"],
-            "Puma": ["puma"],
-            "Salomon": ["salomon"],
-            "Vans": ["vans"]
-        }
-        
-        for brand, keywords in brands.items():
-            if any(kw in name_lower for kw in keywords):
-                return brand
-        
-        return "Unknown"
+        match = _BRAND_RE.search(name)
+        return BRANDS[int(match.lastgroup[1:])][0] if match else "Unknown"
     
     def normalize_release(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
         """Override to add GOAT-specific fields"""
@@ -197,7 +205,10 @@ class GOATScraper(BaseSneakerScraper):
 # Example usage
 async def main():
     scraper = GOATScraper()
-    stats = await scraper.run()
+    try:
+        stats = await scraper.run()
+    finally:
+        await close_browser()
     
     print(f"\n✅ GOAT Scraping Complete!")
     print(f"Releases Found: {stats['releases_found']}")